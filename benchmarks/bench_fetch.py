@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+""" bench_fetch.py: Measures the fetch throughput against a local stub of the KB API that injects failures.
+The stub server answers with the KB fixtures after a delay and, depending on the scenario, fails a share of
+the requests with HTTP 503, hangs longer than the client timeout or throttles with HTTP 429 and Retry-After above a
+request rate. For every scenario the script reports the throughput, the requests the server saw (retries included)
+and the KBs that could not be fetched. It exits with 1 if a KB could not be fetched in any scenario or if the client
+sent new requests while it should wait for the Retry-After time of a throttled request.
+
+Usage:
+    python benchmarks/bench_fetch.py                          # all scenarios, the fixtures requested 10 times
+    python benchmarks/bench_fetch.py --scenarios clean errors --requests 200 --workers 16
+"""
+
+import argparse
+import bisect
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from bench_utils import FIXTURE_DIR, fixture_kb_ids
+
+import webparsing
+
+# Failures injected by the stub server: share of HTTP 503, share of hanging requests and the requests per second
+# above which it answers with HTTP 429
+SCENARIOS = {
+    "clean": {"error_rate": 0.0, "hang_rate": 0.0, "rate_limit": None},
+    "errors": {"error_rate": 0.2, "hang_rate": 0.0, "rate_limit": None},
+    "hangs": {"error_rate": 0.0, "hang_rate": 0.05, "rate_limit": None},
+    "throttled": {"error_rate": 0.0, "hang_rate": 0.0, "rate_limit": 20.0},
+    "mixed": {"error_rate": 0.1, "hang_rate": 0.02, "rate_limit": 40.0},
+}
+# Retry-After of the throttled responses
+RETRY_AFTER_SECONDS = 1
+# Requests already on their way when a throttled response arrives may still reach the server within this time
+RETRY_AFTER_SLACK = 0.1
+
+
+class StubKbApi(ThreadingHTTPServer):
+    """Serves the KB fixtures like the KB API, with a delay and the failures of a scenario"""
+    daemon_threads = True
+
+    def __init__(self, delay: float, hang_seconds: float, error_rate: float = 0.0, hang_rate: float = 0.0,
+                 rate_limit=None, seed: int = 0):
+        super().__init__(("127.0.0.1", 0), StubKbApiHandler)
+        self.delay = delay
+        self.hang_seconds = hang_seconds
+        self.error_rate = error_rate
+        self.hang_rate = hang_rate
+        self.rate_limit = rate_limit
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.throttled = 0
+        self.request_times = []
+        self.throttle_times = []
+        self.window_start = time.monotonic()
+        self.window_requests = 0
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_port}/services/apexrest/v1/article?docid="
+
+    def next_outcome(self):
+        """Returns how to answer the next request: ok, error, hang or throttle"""
+        with self._lock:
+            now = time.monotonic()
+            self.requests += 1
+            self.request_times.append(now)
+            if self.rate_limit is not None:
+                if now - self.window_start >= 1:
+                    self.window_start, self.window_requests = now, 0
+                self.window_requests += 1
+                if self.window_requests > self.rate_limit:
+                    self.throttled += 1
+                    self.throttle_times.append(now)
+                    return "throttle"
+            draw = self.random.random()
+        if draw < self.error_rate:
+            return "error"
+        if draw < self.error_rate + self.hang_rate:
+            return "hang"
+        return "ok"
+
+
+class StubKbApiHandler(BaseHTTPRequestHandler):
+    """Answers a single KB API request"""
+
+    def do_GET(self):
+        outcome = self.server.next_outcome()
+        if outcome == "throttle":
+            self.send_empty(429, {"Retry-After": str(RETRY_AFTER_SECONDS)})
+            return
+        time.sleep(self.server.hang_seconds if outcome == "hang" else self.server.delay)
+        if outcome == "error":
+            self.send_empty(503)
+            return
+        kb_id = parse_qs(urlparse(self.path).query).get("docid", [""])[0]
+        fixture_file = os.path.join(FIXTURE_DIR, f"kb{kb_id}.json")
+        if not kb_id.isdigit() or not os.path.exists(fixture_file):
+            self.send_empty(404)
+            return
+        with open(fixture_file, "rb") as fixture_fh:
+            body = fixture_fh.read()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client gave up on a hanging request
+            pass
+
+    def send_empty(self, status: int, headers=None):
+        """Sends a response without body"""
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def requests_during_pause(request_times, throttle_times):
+    """Returns the number of requests that arrived while the client should have paused for the Retry-After time of
+    an earlier throttled response. The rate limiter of the client pauses all requests, not only the throttled one."""
+    throttle_times = sorted(throttle_times)
+    early_requests = 0
+    for request_time in request_times:
+        # The latest throttled response before this request, the only one whose pause can still cover it
+        throttle_id = bisect.bisect_left(throttle_times, request_time - RETRY_AFTER_SLACK) - 1
+        if throttle_id >= 0 and request_time < throttle_times[throttle_id] + RETRY_AFTER_SECONDS - RETRY_AFTER_SLACK:
+            early_requests += 1
+    return early_requests
+
+
+def run_scenario(scenario_name, kb_ids, args):
+    """Fetches the KB ids from a stub server with the failures of a scenario and returns the measurements"""
+    server = StubKbApi(delay=args.delay, hang_seconds=args.timeout * 4, **SCENARIOS[scenario_name])
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    original_base_url = webparsing.BASEURL_VMWARE_KB
+    webparsing.BASEURL_VMWARE_KB = server.base_url
+    retry_policy = webparsing.RetryPolicy(timeout=args.timeout, retries=args.retries, rate_limit=args.rate_limit)
+    try:
+        start = time.perf_counter()
+        articles = webparsing.fetch_kb_articles(kb_ids, max_workers=args.workers, retry_policy=retry_policy)
+        seconds = time.perf_counter() - start
+    finally:
+        webparsing.BASEURL_VMWARE_KB = original_base_url
+        server.shutdown()
+        server.server_close()
+    return {
+        "seconds": seconds,
+        "kbs_per_second": len(kb_ids) / seconds,
+        "requests": server.requests,
+        "throttled": server.throttled,
+        "failed": sum(1 for _, article in articles if article is None),
+        # Without a rate limiter only the throttled request waits, other requests may go on
+        "early": requests_during_pause(server.request_times, server.throttle_times) if args.rate_limit else None,
+    }
+
+
+def parse_arguments():
+    """Returns the parsed command line arguments"""
+    parser = argparse.ArgumentParser(description="Benchmark fetching KB articles from a failing stub of the KB API")
+    parser.add_argument("--scenarios", nargs="*", choices=SCENARIOS, default=list(SCENARIOS),
+                        help="Failure scenarios to run (default: all)")
+    parser.add_argument("--requests", type=int, help="Number of KB articles fetched per scenario "
+                                                     "(default: every fixture 10 times)")
+    parser.add_argument("--workers", type=int, default=webparsing.DEFAULT_FETCH_WORKERS,
+                        help=f"Fetch threads (default: {webparsing.DEFAULT_FETCH_WORKERS})")
+    parser.add_argument("--delay", type=float, default=0.02, help="Response time of the stub server in seconds")
+    parser.add_argument("--timeout", type=float, default=0.5, help="Client timeout in seconds (default: 0.5)")
+    parser.add_argument("--retries", type=int, default=webparsing.DEFAULT_RETRIES, help="Retries per request")
+    parser.add_argument("--rate-limit", type=float, default=100.0,
+                        help="Requests per second of the client, 0 for no limit (default: 100)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    fixture_ids = fixture_kb_ids()
+    request_count = args.requests or len(fixture_ids) * 10
+    kb_ids = [fixture_ids[request_id % len(fixture_ids)] for request_id in range(request_count)]
+    failed_scenarios = []
+    for scenario_name in args.scenarios:
+        result = run_scenario(scenario_name, kb_ids, args)
+        early = "n/a" if result["early"] is None else result["early"]
+        print(f"{scenario_name:<10} {result['seconds']:>8.2f} s {result['kbs_per_second']:>8.1f} KBs/s "
+              f"{result['requests']:>6} requests {result['throttled']:>5} throttled {result['failed']:>4} failed "
+              f"{early:>4} before Retry-After")
+        if result["failed"] or result["early"]:
+            failed_scenarios.append(scenario_name)
+    if failed_scenarios:
+        print(f"FAILED: KBs not fetched or Retry-After ignored in {', '.join(failed_scenarios)}")
+        sys.exit(1)
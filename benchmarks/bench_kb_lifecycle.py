@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+""" bench_kb_lifecycle.py: Benchmarks the KB object lifecycle on the vCenter KB fixture (2143838).
+Before the lifecycle rework every special-cased KB ran pd.read_html and all transforms twice, once in
+KbData.__init__ and once more in the subclass constructor. This script counts the table extraction passes
+and compares the time of one pass against the old double parse.
+
+Usage: python benchmarks/bench_kb_lifecycle.py [--kb 2143838] [--repeat 20]
+"""
+
+import argparse
+import json
+import time
+
+from bench_utils import load_fixture
+
+import kb_data
+
+
+def build_kb_object(kb_id, raw_html_article):
+    """Runs all stages of a KB object: extraction, transformation and merging"""
+    kb_object = kb_data.create_kb_object(kb_id, raw_html_article)
+    kb_object.list_of_dframes
+    kb_object.list_of_merged_frames
+    return kb_object
+
+
+def build_kb_object_double_parse(kb_id, raw_html_article):
+    """Emulates the old lifecycle that extracted and transformed the tables twice"""
+    kb_object = build_kb_object(kb_id, raw_html_article)
+    kb_object.__dict__.pop("raw_tables")
+    kb_object.parse_releasedata()
+    return kb_object
+
+
+def time_builds(build_function, kb_id, raw_html_article, repeat):
+    """Returns the best time of several runs, each on a fresh copy of the article"""
+    timings = []
+    for _ in range(repeat):
+        article = json.loads(json.dumps(raw_html_article))
+        start = time.perf_counter()
+        build_function(kb_id, article)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def count_extractions(kb_id, raw_html_article):
+    """Returns how often the table extraction ran while building the KB object"""
+    calls = []
+    original_extract_tables = kb_data.KbData.extract_tables
+
+    def counting_extract_tables(self):
+        calls.append(self.id)
+        return original_extract_tables(self)
+
+    kb_data.KbData.extract_tables = counting_extract_tables
+    try:
+        build_kb_object(kb_id, raw_html_article)
+    finally:
+        kb_data.KbData.extract_tables = original_extract_tables
+    return len(calls)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the KB object lifecycle")
+    parser.add_argument("--kb", type=int, default=2143838, help="KB id of the fixture (default: 2143838)")
+    parser.add_argument("--repeat", type=int, default=20, help="Number of runs, the best one is reported")
+    args = parser.parse_args()
+    article = load_fixture(args.kb)
+    extractions = count_extractions(args.kb, article)
+    single_parse = time_builds(build_kb_object, args.kb, article, args.repeat)
+    double_parse = time_builds(build_kb_object_double_parse, args.kb, article, args.repeat)
+    print(f"KB {args.kb}: table extraction passes per object: {extractions}")
+    print(f"KB {args.kb}: single parse lifecycle: {single_parse * 1000:.2f} ms")
+    print(f"KB {args.kb}: old double parse lifecycle: {double_parse * 1000:.2f} ms")
+    print(f"KB {args.kb}: saved {(double_parse - single_parse) * 1000:.2f} ms "
+          f"({(1 - single_parse / double_parse) * 100:.0f}%) per object")
@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+""" bench_lookup_server.py: Load test of lookup_server.py with concurrent clients on the KB fixtures.
+A build index is built from the fixtures and served by lookup_server.py in its own process. Client processes send
+single and batch lookups over keep-alive connections, while the index file is replaced every --reload-every seconds
+to exercise the hot reload. The script reports the throughput and latency percentiles and exits with 1 if a
+request failed or the median latency of single lookups is above --max-median-ms.
+
+Usage:
+    python benchmarks/bench_lookup_server.py                       # half the cores as clients for 5 seconds
+    python benchmarks/bench_lookup_server.py --clients 16 --duration 30 --batch-size 500
+"""
+
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench_utils import BENCHMARK_DIR, MASTER_KB_ID, fixture_kb_ids, load_fixture
+
+import kb_data
+from build_index import BuildIndexWriter
+
+LOOKUP_SERVER = os.path.join(os.path.dirname(BENCHMARK_DIR), "lookup_server.py")
+# Share of the requests that are batch lookups
+BATCH_SHARE = 0.1
+# The other cores are left to the server, clients competing with it for the CPU measure the scheduler
+DEFAULT_CLIENTS = max(1, (os.cpu_count() or 2) // 2)
+
+
+def build_index_file(index_file: str, kb_ids):
+    """Writes a build index of the fixture KBs and returns its build numbers"""
+    index_writer = BuildIndexWriter(index_file)
+    for kb_id in kb_ids:
+        index_writer.replace_kb(kb_data.create_kb_object(kb_id, load_fixture(kb_id)))
+    builds = [build for (build,) in index_writer.connection.execute("SELECT DISTINCT build FROM builds")]
+    index_writer.close()
+    return builds
+
+
+def free_port():
+    """Returns a free TCP port on localhost"""
+    with socket.socket() as probe_socket:
+        probe_socket.bind(("127.0.0.1", 0))
+        return probe_socket.getsockname()[1]
+
+
+def wait_for_server(port: int, timeout: float = 30.0):
+    """Waits until the lookup server answers its health check"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            connection.request("GET", "/health")
+            if connection.getresponse().status == 200:
+                connection.close()
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise TimeoutError(f"Lookup server did not start on port {port}")
+
+
+def run_client(port: int, builds, duration: float, batch_size: int, seed: int):
+    """Sends lookups over one keep-alive connection for duration seconds.
+    Returns the latencies of single and batch lookups in seconds and the number of failed requests."""
+    rng = random.Random(seed)
+    # Some unknown build numbers, they are answered with 404
+    candidates = builds + [str(9000000 + build_id) for build_id in range(len(builds) // 10)]
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    single_latencies, batch_latencies, failures = [], [], 0
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        is_batch = rng.random() < BATCH_SHARE
+        start = time.perf_counter()
+        try:
+            if is_batch:
+                body = json.dumps(rng.sample(candidates, min(batch_size, len(candidates))))
+                connection.request("POST", "/builds", body=body, headers={"Content-Type": "application/json"})
+            else:
+                connection.request("GET", f"/build/{rng.choice(candidates)}")
+            response = connection.getresponse()
+            response.read()
+            if response.status not in (200, 404):
+                failures += 1
+                continue
+        except (OSError, http.client.HTTPException):
+            failures += 1
+            connection.close()
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+            continue
+        (batch_latencies if is_batch else single_latencies).append(time.perf_counter() - start)
+    connection.close()
+    return single_latencies, batch_latencies, failures
+
+
+def percentile(values, share: float):
+    """Returns the value below which the given share of the sorted values lies"""
+    if not values:
+        return float("nan")
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+def print_latencies(name: str, latencies, duration: float):
+    """Prints the throughput and latency percentiles of a kind of request"""
+    latencies = sorted(latencies)
+    print(f"{name:<8} {len(latencies) / duration:>10,.0f} req/s  p50 {percentile(latencies, 0.5) * 1000:.3f} ms  "
+          f"p95 {percentile(latencies, 0.95) * 1000:.3f} ms  p99 {percentile(latencies, 0.99) * 1000:.3f} ms")
+
+
+def parse_arguments():
+    """Returns the parsed command line arguments"""
+    parser = argparse.ArgumentParser(description="Load test the lookup server")
+    parser.add_argument("--clients", type=int, default=DEFAULT_CLIENTS,
+                        help=f"Concurrent client processes (default: half the cores, here {DEFAULT_CLIENTS})")
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds of load (default: 5)")
+    parser.add_argument("--batch-size", type=int, default=100, help="Build numbers per batch lookup (default: 100)")
+    parser.add_argument("--reload-every", type=float, default=1.0,
+                        help="Seconds between replacements of the index file, 0 for none (default: 1)")
+    parser.add_argument("--max-median-ms", type=float, default=1.0,
+                        help="Highest acceptable median latency of single lookups (default: 1 ms)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    work_dir = tempfile.mkdtemp(prefix="bench_lookup_server_")
+    release_kb_ids = [kb_id for kb_id in fixture_kb_ids() if kb_id != MASTER_KB_ID]
+    index_file = os.path.join(work_dir, "build_index.sqlite")
+    # Two versions of the index the file alternates between, the second one without the last KB
+    index_versions = [os.path.join(work_dir, "full.sqlite"), os.path.join(work_dir, "partial.sqlite")]
+    builds = build_index_file(index_versions[0], release_kb_ids)
+    build_index_file(index_versions[1], release_kb_ids[:-1])
+    shutil.copy(index_versions[0], index_file)
+    port = free_port()
+    server_process = subprocess.Popen([sys.executable, LOOKUP_SERVER, "--index", index_file, "--port", str(port),
+                                       "--reload-interval", "0.2", "--log-level", "WARNING"])
+    try:
+        wait_for_server(port)
+        with multiprocessing.Pool(args.clients) as pool:
+            client_results = pool.starmap_async(run_client, [(port, builds, args.duration, args.batch_size, seed)
+                                                             for seed in range(args.clients)])
+            reloads = 0
+            deadline = time.monotonic() + args.duration
+            while args.reload_every > 0 and time.monotonic() + args.reload_every < deadline:
+                time.sleep(args.reload_every)
+                reloads += 1
+                # Published like the pipeline does it: written next to the index and renamed over it
+                shutil.copy(index_versions[reloads % 2], f"{index_file}.new")
+                os.replace(f"{index_file}.new", index_file)
+            client_results = client_results.get()
+    finally:
+        server_process.terminate()
+        server_process.wait()
+        shutil.rmtree(work_dir, ignore_errors=True)
+    single_latencies = [latency for result in client_results for latency in result[0]]
+    batch_latencies = [latency for result in client_results for latency in result[1]]
+    failures = sum(result[2] for result in client_results)
+    print(f"{args.clients} clients, {args.duration:.0f} s, {len(builds)} build numbers, {reloads} index reloads")
+    print_latencies("single", single_latencies, args.duration)
+    print_latencies(f"batch/{args.batch_size}", batch_latencies, args.duration)
+    print(f"failed   {failures}")
+    median_ms = percentile(sorted(single_latencies), 0.5) * 1000
+    if failures or median_ms > args.max_median_ms:
+        print(f"FAILED: {failures} failed requests, median single lookup {median_ms:.3f} ms")
+        sys.exit(1)
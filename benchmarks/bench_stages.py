@@ -0,0 +1,231 @@
+#!/usr/bin/env python
+""" bench_stages.py: Times every stage of the pipeline on the KB fixtures and on synthetic tables.
+Stages: resolution extraction, table extraction, parse_releasedata, standardize_columns, date coercion (also
+with the pd.to_datetime inference used before date_parsing),
+merge_tables_kb2143838, transform_index, create_json_output for each JSON orientation and the single-pass
+create_json_outputs for all orientations, indented and compact.
+For every stage the best wall time, the throughput in table rows per second and the peak of allocated memory
+are reported. With a baseline file the script exits with 1 if a stage got slower or needs more memory than the
+threshold allows.
+
+Usage:
+    python benchmarks/bench_stages.py                                # KB fixtures, 10k and 100k rows
+    python benchmarks/bench_stages.py --scales 10000 100000 1000000  # add a table with 1M rows
+    python benchmarks/bench_stages.py --update-baseline              # store the results as the new baseline
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+from types import SimpleNamespace
+
+from bench_utils import BENCHMARK_DIR, MASTER_KB_ID, copy_frames, fixture_kb_ids, load_fixture, measure, \
+    synthetic_release_article
+
+import pandas as pd
+
+import kb_data
+from date_parsing import parse_dates
+from data_handling import create_json_output, create_json_outputs, standardize_columns, transform_index
+from table_extraction import promote_header_rows
+from webparsing import extract_kb_article_ids
+
+DEFAULT_BASELINE_FILE = os.path.join(BENCHMARK_DIR, "baseline.json")
+DEFAULT_SCALES = [10000, 100000]
+JSONRECORDS = ["records", "table", "index"]
+# A stage regresses if it is this much slower (or bigger) than the baseline ...
+DEFAULT_THRESHOLD = 0.5
+# ... and the difference is above the noise floor
+NOISE_FLOOR_SECONDS = 0.002
+NOISE_FLOOR_BYTES = 256 * 1024
+# KB id used for the synthetic release tables, it is handled by the generic KbData class
+SYNTHETIC_KB_ID = 9000000
+
+
+def promoted_raw_tables(raw_tables):
+    """Returns the raw tables with the header row promoted where needed, like the generic KbData does"""
+    return [dataframe if "Version" in dataframe.columns else promote_header_rows(dataframe)
+            for dataframe in raw_tables]
+
+
+def release_date_columns(raw_tables):
+    """Returns the unparsed release date columns of the raw tables"""
+    date_columns = []
+    for dataframe in promoted_raw_tables(copy_frames(raw_tables)):
+        dataframe = standardize_columns(dataframe)
+        if "Release Date" in dataframe.columns:
+            date_columns.append(dataframe["Release Date"].astype(str))
+    return date_columns
+
+
+def coerce_dates(date_columns):
+    """The date coercion as done in every parse_releasedata variant"""
+    return [parse_dates(date_column)[0] for date_column in date_columns]
+
+
+def coerce_dates_inferred(date_columns):
+    """The date coercion used before date_parsing, for comparison"""
+    return [pd.to_datetime(date_column, infer_datetime_format=True, errors="coerce") for date_column in date_columns]
+
+
+def scale_frames(dataframes, row_count: int):
+    """Repeats every dataframe until the list holds about row_count rows in total"""
+    rows_per_frame = max(1, row_count // len(dataframes))
+    scaled_frames = []
+    for dataframe in dataframes:
+        repeats = max(1, rows_per_frame // max(1, len(dataframe)))
+        scaled_frames.append(pd.concat([dataframe] * repeats, ignore_index=True))
+    return scaled_frames
+
+
+def benchmark_release_kb(case_name, kb_id, article, repeat, results):
+    """Times all stages of a KB with release tables"""
+    base_object = kb_data.create_kb_object(kb_id, article)
+    raw_tables = base_object.extract_tables()
+    parsed_object = kb_data.create_kb_object(kb_id, article)
+    parsed_frames = parsed_object.list_of_dframes
+    merged_frames = parsed_object.list_of_merged_frames
+    row_count = sum(len(dataframe) for dataframe in parsed_frames)
+
+    def fresh_object(list_of_dframes=None):
+        kb_object = kb_data.create_kb_object(kb_id, article)
+        kb_object.__dict__["raw_tables"] = copy_frames(raw_tables)
+        if list_of_dframes is not None:
+            kb_object.__dict__["list_of_dframes"] = list_of_dframes
+        return kb_object
+
+    stages = {
+        "resolution_extraction": (lambda: kb_data.get_resolution_html(article), None),
+        "extract_tables": (lambda: base_object.extract_tables(), None),
+        "parse_releasedata": (lambda kb_object: kb_object.parse_releasedata(), lambda: (fresh_object(),)),
+        "standardize_columns": (lambda frames: [standardize_columns(frame) for frame in frames],
+                                lambda: (promoted_raw_tables(copy_frames(raw_tables)),)),
+        "date_coercion": (coerce_dates, lambda: (release_date_columns(raw_tables),)),
+        "date_coercion_inferred": (coerce_dates_inferred, lambda: (release_date_columns(raw_tables),)),
+        "transform_index": (lambda frames: [transform_index(frame) for frame in frames],
+                            lambda: ([frame for frame in copy_frames(parsed_frames) if "Build Number" in frame],)),
+    }
+    if isinstance(parsed_object, kb_data.Kb2143838):
+        stages["merge_tables_kb2143838"] = (lambda kb_object: kb_object.merge_tables_kb2143838(),
+                                            lambda: (fresh_object(copy_frames(parsed_frames)),))
+    output_dir = tempfile.mkdtemp(prefix="bench_stages_")
+
+    def output_object():
+        return SimpleNamespace(id=kb_id, fmt_product=parsed_object.fmt_product,
+                               list_of_dframes=copy_frames(parsed_frames),
+                               list_of_merged_frames=copy_frames(merged_frames)),
+
+    try:
+        for record_type in JSONRECORDS:
+            stages[f"create_json_output_{record_type}"] = (
+                lambda kb_object, record_type=record_type: create_json_output(kb_object, output_dir, record_type),
+                output_object)
+        stages["create_json_outputs"] = (lambda kb_object: create_json_outputs(kb_object, output_dir), output_object)
+        stages["create_json_outputs_compact"] = (
+            lambda kb_object: create_json_outputs(kb_object, output_dir, compact=True), output_object)
+        for stage_name, (stage_function, prepare) in stages.items():
+            record_result(results, case_name, stage_name, row_count, *measure(stage_function, prepare, repeat))
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+
+def benchmark_scaled_merge(case_name, row_count: int, repeat, results):
+    """Times merge_tables_kb2143838 on the vCenter tables repeated to about row_count rows"""
+    article = load_fixture(2143838)
+    scaled_frames = scale_frames(kb_data.create_kb_object(2143838, article).list_of_dframes, row_count)
+
+    def fresh_object():
+        kb_object = kb_data.create_kb_object(2143838, article)
+        kb_object.__dict__["list_of_dframes"] = copy_frames(scaled_frames)
+        return kb_object,
+
+    record_result(results, case_name, "merge_tables_kb2143838", sum(len(frame) for frame in scaled_frames),
+                  *measure(lambda kb_object: kb_object.merge_tables_kb2143838(), fresh_object, repeat))
+
+
+def benchmark_master_kb(case_name, article, repeat, results):
+    """Times the extraction of the KB ids from the master KB"""
+    kb_ids = extract_kb_article_ids(article)
+    record_result(results, case_name, "resolution_extraction", len(kb_ids),
+                  *measure(lambda: extract_kb_article_ids(article), None, repeat))
+
+
+def record_result(results, case_name, stage_name, row_count, seconds, peak_bytes):
+    """Stores and prints the measurement of one stage"""
+    rows_per_second = row_count / seconds if seconds > 0 else float("inf")
+    results[f"{case_name}/{stage_name}"] = {
+        "rows": row_count,
+        "seconds": seconds,
+        "rows_per_second": rows_per_second,
+        "peak_bytes": peak_bytes,
+    }
+    print(f"{case_name:<24} {stage_name:<30} {seconds * 1000:>10.2f} ms {rows_per_second:>14,.0f} rows/s "
+          f"{peak_bytes / (1024 * 1024):>9.2f} MiB peak")
+
+
+def find_regressions(results, baseline, threshold: float):
+    """Returns a list of messages for all stages that regressed against the baseline"""
+    regressions = []
+    for stage_key, result in results.items():
+        reference = baseline.get(stage_key)
+        if reference is None:
+            continue
+        if (result["seconds"] > reference["seconds"] * (1 + threshold)
+                and result["seconds"] - reference["seconds"] > NOISE_FLOOR_SECONDS):
+            regressions.append(f"{stage_key}: {result['seconds'] * 1000:.2f} ms, "
+                               f"baseline {reference['seconds'] * 1000:.2f} ms")
+        if (result["peak_bytes"] > reference["peak_bytes"] * (1 + threshold)
+                and result["peak_bytes"] - reference["peak_bytes"] > NOISE_FLOOR_BYTES):
+            regressions.append(f"{stage_key}: {result['peak_bytes']} bytes peak memory, "
+                               f"baseline {reference['peak_bytes']} bytes")
+    return regressions
+
+
+def parse_arguments():
+    """Returns the parsed command line arguments"""
+    parser = argparse.ArgumentParser(description="Benchmark every stage of the pipeline without network access")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of timed runs per stage, the best is reported")
+    parser.add_argument("--scales", type=int, nargs="*", default=DEFAULT_SCALES,
+                        help=f"Row counts of the synthetic tables (default: {DEFAULT_SCALES})")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE_FILE,
+                        help="Results of a previous run to compare against (default: benchmarks/baseline.json)")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help=f"Allowed relative slowdown or memory growth per stage (default: {DEFAULT_THRESHOLD})")
+    parser.add_argument("--update-baseline", action="store_true", help="Write the results as the new baseline")
+    parser.add_argument("--output", help="Also write the results to this JSON file")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    results = {}
+    for kb_id in fixture_kb_ids():
+        if kb_id == MASTER_KB_ID:
+            benchmark_master_kb(f"kb{kb_id}", load_fixture(kb_id), args.repeat, results)
+        else:
+            benchmark_release_kb(f"kb{kb_id}", kb_id, load_fixture(kb_id), args.repeat, results)
+    for row_count in args.scales:
+        # Large tables are slow enough to be measured by fewer runs
+        scaled_repeat = max(1, args.repeat // max(1, row_count // 10000))
+        benchmark_release_kb(f"synthetic-{row_count}", SYNTHETIC_KB_ID, synthetic_release_article(row_count),
+                             scaled_repeat, results)
+        benchmark_scaled_merge(f"synthetic-vcenter-{row_count}", row_count, scaled_repeat, results)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output_fh:
+            json.dump(results, output_fh, indent=4, sort_keys=True)
+    if args.update_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as baseline_fh:
+            json.dump(results, baseline_fh, indent=4, sort_keys=True)
+        print(f"Baseline written to {args.baseline}")
+        sys.exit(0)
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}, run with --update-baseline to create one")
+        sys.exit(0)
+    with open(args.baseline, "r", encoding="utf-8") as baseline_fh:
+        regressions = find_regressions(results, json.load(baseline_fh), args.threshold)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    sys.exit(1 if regressions else 0)
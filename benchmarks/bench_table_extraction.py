@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+""" bench_table_extraction.py: Compares the lxml table extractor with pd.read_html(flavor="bs4").
+Both are run on the resolution section of every KB fixture and on small tables with the markup found in KB
+cells (<br>, <span>/<p>, entities, nested tables). The script fails if the extracted dataframes differ in any
+way and reports the time of both engines.
+
+Usage: python benchmarks/bench_table_extraction.py [--repeat 10]
+"""
+
+import argparse
+import time
+
+from bench_utils import fixture_kb_ids, load_fixture
+
+import pandas as pd
+
+from kb_data import get_resolution_html
+from table_extraction import extract_tables
+
+
+# Cell markup the fixtures have to be extracted exactly like pd.read_html does
+MARKUP_CASES = {
+    "br": "<table><tr><th>Version</th><th>Build Number</th></tr>"
+          "<tr><td>ESXi 7.0<br>Update 3c</td><td>19193900<br/></td></tr></table>",
+    "span_p": "<table><tr><th>Version</th><th>Build Number</th></tr>"
+              "<tr><td><p>ESXi <span>7.0</span></p><p>Update 3</p></td><td><span>19193900</span></td></tr></table>",
+    "entities": "<table><tr><th>Release&nbsp;Name</th><th>Build Number</th></tr>"
+                "<tr><td>ESXi&nbsp;7.0&nbsp;&nbsp;U3 &amp; later</td><td>&nbsp;19193900&nbsp;</td></tr></table>",
+    "nested_table": "<table><tr><th>Version</th><th>Build Number</th></tr>"
+                    "<tr><td>ESXi 7.0<table><tr><td>inner</td><td>x</td></tr></table></td><td>19193900</td></tr>"
+                    "</table>",
+    "nested_table_head": "<table><thead><tr><th>Version</th><th>Build Number</th></tr></thead>"
+                         "<tr><td>ESXi 7.0<table><thead><tr><th>h</th></tr></thead><tr><td>in<br>ner</td>"
+                         "<td>x</td></tr></table></td><td>19193900</td></tr></table>",
+}
+
+
+def load_resolutions():
+    """Returns a dict of fixture name and resolution HTML for all KB fixtures and the markup cases"""
+    resolutions = {f"kb{kb_id}": get_resolution_html(load_fixture(kb_id)) for kb_id in fixture_kb_ids()}
+    resolutions.update(MARKUP_CASES)
+    return resolutions
+
+
+def read_html_bs4(resolution_html):
+    """The extraction engine used before table_extraction"""
+    return pd.read_html(resolution_html, flavor="bs4")
+
+
+def compare_engines(resolutions):
+    """Asserts that both engines return identical dataframes for every table"""
+    for fixture_name, resolution_html in resolutions.items():
+        expected_tables = read_html_bs4(resolution_html)
+        extracted_tables = extract_tables(resolution_html)
+        if len(expected_tables) != len(extracted_tables):
+            raise AssertionError(f"{fixture_name}: {len(extracted_tables)} tables extracted, "
+                                 f"pd.read_html found {len(expected_tables)}")
+        for expected_df, extracted_df in zip(expected_tables, extracted_tables):
+            pd.testing.assert_frame_equal(expected_df, extracted_df)
+
+
+def time_engine(engine, resolutions, repeat):
+    """Returns the best time of several runs over all resolution sections"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for resolution_html in resolutions.values():
+            engine(resolution_html)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the table extraction engines")
+    parser.add_argument("--repeat", type=int, default=10, help="Number of runs, the best one is reported")
+    args = parser.parse_args()
+    resolutions = load_resolutions()
+    compare_engines(resolutions)
+    print(f"Identical output for {len(resolutions) - len(MARKUP_CASES)} KB fixtures and {len(MARKUP_CASES)} markup cases")
+    read_html_time = time_engine(read_html_bs4, resolutions, args.repeat)
+    extractor_time = time_engine(extract_tables, resolutions, args.repeat)
+    print(f"pd.read_html(flavor='bs4'): {read_html_time * 1000:.2f} ms")
+    print(f"table_extraction (lxml): {extractor_time * 1000:.2f} ms")
+    print(f"Speed-up: {read_html_time / extractor_time:.1f}x")
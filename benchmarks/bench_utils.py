@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+""" bench_utils.py: Shared helpers for the benchmarks: hand-written KB fixtures, synthetic articles and measurements.
+The fixtures in benchmarks/fixtures have the shape get_kb_webdata returns and the table markup of the live articles,
+so the parsing code runs as it does against the KB API. The build numbers and dates in them are made up.
+"""
+
+import gc
+import glob
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURE_DIR = os.path.join(BENCHMARK_DIR, "fixtures")
+
+sys.path.insert(0, os.path.dirname(BENCHMARK_DIR))
+
+# The master KB holds the links to all other KBs, it has no release tables
+MASTER_KB_ID = 1014508
+
+
+def load_fixture(kb_id):
+    """Returns the fixture KB article in the shape get_kb_webdata returns it"""
+    with open(os.path.join(FIXTURE_DIR, f"kb{kb_id}.json"), "r", encoding="utf-8") as fixture_fh:
+        return json.load(fixture_fh)
+
+
+def fixture_kb_ids():
+    """Returns the KB ids of all fixtures, the master KB first"""
+    kb_ids = sorted(int(os.path.basename(fixture_file)[2:-5])
+                    for fixture_file in glob.glob(os.path.join(FIXTURE_DIR, "kb*.json")))
+    return sorted(kb_ids, key=lambda kb_id: kb_id != MASTER_KB_ID)
+
+
+def synthetic_release_article(row_count: int):
+    """Returns an ESXi-like KB article whose single release table has row_count rows with unique build numbers"""
+    rows = []
+    for row_id in range(row_count):
+        year = 2021 - (row_id // 365) % 20
+        month = 1 + row_id % 12
+        day = 1 + row_id % 28
+        rows.append(f"<tr><td>ESXi {7 - row_id % 3}.0 Update {row_id % 4} build {row_id}</td>"
+                    f"<td>ESXi {7 - row_id % 3}.0 U{row_id % 4}</td>"
+                    f"<td>{year:04d}-{month:02d}-{day:02d}</td>"
+                    f"<td>{10000000 + row_id}</td><td>{'Yes' if row_id % 3 else 'No'}</td></tr>")
+    resolution = ("<table><thead><tr><th>Version</th><th>Release Name</th><th>Release Date</th>"
+                  "<th>Build Number</th><th>Available as ISO</th></tr></thead><tbody>"
+                  + "".join(rows) + "</tbody></table>")
+    return {
+        "meta": {"articleInfo": {"title": f"Synthetic release table ({row_count} rows)"},
+                 "articleProducts": {"relatedProducts": ["VMware vSphere ESXi"]}},
+        "content": [{"Purpose": "<p>Synthetic</p>"}, {"Resolution": resolution}],
+    }
+
+
+def copy_frames(dataframes):
+    """Returns deep copies of a list or dict of dataframes, so destructive stages can be repeated"""
+    if dataframes is None:
+        return None
+    if isinstance(dataframes, dict):
+        return {name: dataframe.copy(deep=True) for name, dataframe in dataframes.items()}
+    return [dataframe.copy(deep=True) for dataframe in dataframes]
+
+
+def measure(stage_function, prepare=None, repeat: int = 5):
+    """Runs a stage several times and returns the best wall time in seconds and the peak of allocated bytes.
+    prepare() returns fresh arguments for every run, its time is not measured."""
+    timings = []
+    for _ in range(repeat):
+        args = prepare() if prepare is not None else ()
+        gc.collect()
+        start = time.perf_counter()
+        stage_function(*args)
+        timings.append(time.perf_counter() - start)
+    # tracemalloc slows everything down, measure memory in a separate run
+    args = prepare() if prepare is not None else ()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        stage_function(*args)
+        _, peak_bytes = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return min(timings), peak_bytes
+
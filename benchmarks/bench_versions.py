@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+""" bench_versions.py: Checks the version keys of versions.py on known version strings and times them.
+The cases cover the ways KBs write the same release (Update/U, Express Patch/EP, patch letters, 7.0.3 and 7.0 U3)
+and the order of releases. The script fails if a key or an order differs from the expected one and reports the
+time of version_key() and of range queries over the build index of the KB fixtures.
+
+Usage: python benchmarks/bench_versions.py [--repeat 10]
+"""
+
+import argparse
+import sys
+import time
+
+from bench_utils import MASTER_KB_ID, fixture_kb_ids, load_fixture
+
+import kb_data
+from build_index import COLUMNS, kb_build_rows
+from version_index import VersionIndex
+from versions import parse_version, version_bounds, version_key
+
+# Version strings and the parts they must have, parts not listed must be None
+PARSE_CASES = {
+    "ESXi 7.0 Update 3c": {"major": 7, "minor": 0, "patch": 3, "update": 3, "letter": 3},
+    "7.0 U3c": {"major": 7, "minor": 0, "patch": 3, "update": 3, "letter": 3},
+    "7.0.3": {"major": 7, "minor": 0, "patch": 3, "update": 3},
+    "vCenter Server 7.0.3.00100": {"major": 7, "minor": 0, "patch": 3, "fix": 100, "update": 3},
+    "6.7 U3": {"major": 6, "minor": 7, "patch": 0, "update": 3},
+    "6.5.0 P03": {"major": 6, "minor": 5, "patch": 0, "patch_kind": 1, "patch_number": 3},
+    "ESXi 6.7 Patch 2": {"major": 6, "minor": 7, "patch_kind": 1, "patch_number": 2},
+    "ESXi 6.7 EP 15": {"major": 6, "minor": 7, "patch_kind": 2, "patch_number": 15},
+    "ESXi 6.7 Express Patch 15": {"major": 6, "minor": 7, "patch_kind": 2, "patch_number": 15},
+    "ESXi 6.7 EP 1a": {"major": 6, "minor": 7, "patch_kind": 2, "patch_number": 1, "patch_letter": 1},
+    "ESXi 6.7 Express Patch 1a": {"major": 6, "minor": 7, "patch_kind": 2, "patch_number": 1, "patch_letter": 1},
+    "ESXi 6.0 Update 3 Express  Patch 2": {"major": 6, "minor": 0, "patch": 0, "update": 3, "patch_kind": 2,
+                                           "patch_number": 2},
+    "7.0 GA": {"major": 7, "minor": 0, "patch": 0, "update": 0},
+}
+# Version strings of the same release, they must get the same key
+SAME_RELEASE_CASES = [
+    ("7.0.3", "7.0 U3", "ESXi 7.0 Update 3"),
+    ("ESXi 6.7 EP 15", "ESXi 6.7 Express Patch 15"),
+    ("ESXi 6.7 EP 1a", "ESXi 6.7 Express Patch 1a"),
+    ("6.7 U3", "6.7.0 Update 3"),
+]
+# Version strings in ascending order
+ORDER_CASES = [
+    ("7.0 U2", "7.0.2.00100", "7.0 U3", "7.0 U3a", "7.0 U3c", "8.0"),
+    ("7.0.2.00500", "7.0.3", "7.0.3.00100", "7.0.3.00500", "7.0.4"),
+    ("ESXi 6.7 EP 1", "ESXi 6.7 Express Patch 1a", "ESXi 6.7 EP 1b", "ESXi 6.7 EP 2"),
+    ("6.5.0 P03", "6.5 U1", "6.5 U3"),
+]
+# Range bounds and versions that must be inside them
+BOUNDS_CASES = {
+    "7.0 U3": ("7.0.3", "7.0 U3c", "7.0.3.00100", "7.0 U3 EP 1a"),
+    "7.0.3": ("7.0 U3", "7.0.3.00100"),
+}
+
+
+def check_versions():
+    """Returns the failed cases as a list of messages"""
+    failures = []
+    for text, expected_parts in PARSE_CASES.items():
+        parts = {name: value for name, value in parse_version(text).items() if value is not None}
+        if parts != expected_parts:
+            failures.append(f"{text!r}: parts {parts}, expected {expected_parts}")
+    for texts in SAME_RELEASE_CASES:
+        if len({version_key(text) for text in texts}) != 1:
+            failures.append(f"Different keys for the same release: {texts}")
+    for texts in ORDER_CASES:
+        keys = [version_key(text) for text in texts]
+        if keys != sorted(keys) or len(set(keys)) != len(keys):
+            failures.append(f"Keys not in ascending order: {texts}")
+    for bound, texts in BOUNDS_CASES.items():
+        low_key, high_key = version_bounds(bound)
+        for text in texts:
+            if not low_key <= version_key(text) <= high_key:
+                failures.append(f"{text!r} is not covered by {bound!r}")
+    return failures
+
+
+def fixture_version_index():
+    """Returns the version index of all release KB fixtures"""
+    rows = []
+    for kb_id in fixture_kb_ids():
+        if kb_id != MASTER_KB_ID:
+            rows.extend(kb_build_rows(kb_data.create_kb_object(kb_id, load_fixture(kb_id))))
+    return VersionIndex(dict(zip(COLUMNS, row)) for row in rows), rows
+
+
+def best_time(function, repeat):
+    """Returns the best time of several calls of a function"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check and time the version keys")
+    parser.add_argument("--repeat", type=int, default=10, help="Number of runs, the best one is reported")
+    args = parser.parse_args()
+    failures = check_versions()
+    for failure in failures:
+        print(f"FAILED: {failure}")
+    if failures:
+        sys.exit(1)
+    print(f"Expected keys for {len(PARSE_CASES)} version strings, {len(SAME_RELEASE_CASES)} same-release, "
+          f"{len(ORDER_CASES)} order and {len(BOUNDS_CASES)} range cases")
+    version_index, index_rows = fixture_version_index()
+    versions = [row[COLUMNS.index("version")] for row in index_rows]
+    key_time = best_time(lambda: [version_key(version) for version in versions], args.repeat)
+    range_time = best_time(lambda: [version_index.range(product, "7.0 U1", "7.0 U3")
+                                    for product, _ in version_index.products()], args.repeat)
+    print(f"version_key: {key_time / len(versions) * 1e6:.2f} us per version ({len(versions)} versions)")
+    print(f"range query: {range_time / len(version_index.products()) * 1e6:.2f} us per release line")
@@ -0,0 +1,309 @@
+#!/usr/bin/env python
+""" build_index.py: Provides resolution table from VMware KBs as machine-readable json files.
+VMware KBs provide release information only as a human-readable HTML table.
+However, for automation it would be nice to have it in a machine-readable format.
+This script takes the tables from a VMware KB page and provides a json-file as an output.
+
+This program is free software: you can redistribute it and/or modify it under
+the terms of the GNU General Public License as published by the Free Software
+Foundation, either version 3 of the License, or (at your option) any later
+version.
+This program is distributed in the hope that it will be useful, but WITHOUT
+ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+You should have received a copy of the GNU General Public License along with
+this program. If not, see <http://www.gnu.org/licenses/>.
+"""
+
+__author__ = "Dominik Zorgnotti"
+__contact__ = "dominik@why-did-it.fail"
+__created__ = "2026-10-17"
+__deprecated__ = False
+__contact__ = "dominik@why-did-it.fail"
+__license__ = "GPLv3"
+__status__ = "beta"
+__version__ = "0.1.0"
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+
+import pandas as pd
+
+from date_parsing import parse_dates
+from versions import format_version_key, version_key
+
+BUILD_INDEX_FILENAME = "build_index.sqlite"
+# Columns holding build numbers, with the build type stored in the index and the column holding their version
+BUILD_COLUMNS = {
+    # When you access the vCenter API these values are returned, KB2143838 aliases them as Build Number
+    "Client/MOB/vpxd.log": ("client/mob/vpxd.log", "Version"),
+    "Build Number": ("build", "Version"),
+    # KB52075 (vxrail) lists the ESXi and VxRail manager builds of every VxRail release
+    "ESXi build number": ("esxi", "ESXi version"),
+    "VxRail manager build number": ("vxrail manager", "VxRail manager version"),
+}
+# The first of these columns that exists is stored as the release name
+RELEASE_NAME_COLUMNS = ["Release Name", "VxRail Release"]
+# SQLite has a limit on the number of variables per statement
+LOOKUP_CHUNK_SIZE = 500
+# Let SQLite memory-map the index file for lookups
+MMAP_SIZE = 256 * 1024 * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS builds (
+    build TEXT NOT NULL,
+    build_type TEXT NOT NULL,
+    product TEXT,
+    kb_id INTEGER NOT NULL,
+    table_name TEXT NOT NULL,
+    edition TEXT,
+    version TEXT,
+    release_name TEXT,
+    release_date TEXT,
+    version_key TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_builds_build ON builds (build);
+CREATE INDEX IF NOT EXISTS idx_builds_kb_id ON builds (kb_id);
+CREATE INDEX IF NOT EXISTS idx_builds_product_version ON builds (product, version_key);
+CREATE TABLE IF NOT EXISTS indexed_kbs (
+    kb_id INTEGER PRIMARY KEY,
+    product TEXT
+);
+"""
+COLUMNS = ["build", "build_type", "product", "kb_id", "table_name", "edition", "version", "release_name",
+           "release_date", "version_key"]
+
+
+def normalize_build_number(value):
+    """Returns a build number as a lower-case string without decoration, None for empty cells.
+    17694817, 17694817.0, " 17694817 " and "Build 17694817" are all stored as "17694817"."""
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    build = str(value).strip().lower().replace(",", "")
+    for prefix in ("build-", "build "):
+        if build.startswith(prefix):
+            build = build[len(prefix):].strip()
+    return build or None
+
+
+def format_cell(value):
+    """Returns a table cell as a string for the index, release dates as ISO dates"""
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    if isinstance(value, pd.Timestamp):
+        return value.date().isoformat()
+    return str(value).strip()
+
+
+def table_build_rows(dataframe, kb_id, product, table_name):
+    """Yields the index rows for every build number in a release table.
+    A build number listed in several build columns of the same row (e.g. an alias) is indexed once."""
+    release_name_column = next((column for column in RELEASE_NAME_COLUMNS if column in dataframe.columns), None)
+    indexed_builds = set()
+    for build_column, (build_type, version_column) in BUILD_COLUMNS.items():
+        if build_column not in dataframe.columns:
+            continue
+        columns = {
+            "build": dataframe[build_column],
+            "edition": dataframe["Edition"] if "Edition" in dataframe.columns else None,
+            "version": dataframe[version_column] if version_column in dataframe.columns else None,
+            "release_name": dataframe[release_name_column] if release_name_column else None,
+            "release_date": index_release_dates(dataframe["Release Date"]) if "Release Date" in dataframe.columns
+            else None,
+        }
+        values = {name: column.tolist() if column is not None else [None] * len(dataframe)
+                  for name, column in columns.items()}
+        for row_id, (build, edition, version, release_name, release_date) in enumerate(zip(
+                values["build"], values["edition"], values["version"], values["release_name"],
+                values["release_date"])):
+            build = normalize_build_number(build)
+            if build is None or (row_id, build) in indexed_builds:
+                continue
+            indexed_builds.add((row_id, build))
+            version, release_name = format_cell(version), format_cell(release_name)
+            yield (build, build_type, product, kb_id, table_name, format_cell(edition), version, release_name,
+                   format_cell(release_date), row_version_key(version, release_name))
+
+
+def index_release_dates(column):
+    """Returns a release date column with the dates parsed, the KB parsers leave some tables (e.g. KB52075) as text.
+    Cells that are no date keep their text."""
+    parsed_column, _, _ = parse_dates(column)
+    return parsed_column.where(parsed_column.notna(), column)
+
+
+def row_version_key(version, release_name):
+    """Returns the sortable version key of an index row, from its version or else its release name"""
+    return version_key(version) or version_key(release_name)
+
+
+def kb_build_rows(kb_dataobject):
+    """Returns the index rows for all release tables of a KB object"""
+    rows = []
+    for table_id, dataframe in enumerate(kb_dataobject.list_of_dframes):
+        rows.extend(table_build_rows(dataframe, kb_dataobject.id, kb_dataobject.product, f"table{table_id}"))
+    return rows
+
+
+def read_index_rows(index_file: str):
+    """Returns all rows of a build index file as tuples in the order of COLUMNS, sorted by KB and table.
+    The version keys of an index written before they were stored are computed on the fly."""
+    if not os.path.exists(index_file):
+        raise FileNotFoundError(f"No build index at {index_file}")
+    connection = sqlite3.connect(f"file:{index_file}?mode=ro", uri=True)
+    try:
+        stored_columns = [row[1] for row in connection.execute("PRAGMA table_info(builds)")]
+        columns = [column for column in COLUMNS if column in stored_columns]
+        rows = connection.execute(f"SELECT {', '.join(columns)} FROM builds ORDER BY kb_id, table_name").fetchall()
+    finally:
+        connection.close()
+    if "version_key" in columns:
+        return rows
+    return [row + (row_version_key(row[COLUMNS.index("version")], row[COLUMNS.index("release_name")]),)
+            for row in rows]
+
+
+class BuildIndexWriter:
+    """Maintains the consolidated build index in a SQLite file, KB by KB.
+    KBs that are not rebuilt in a run keep their rows from the previous run."""
+
+    def __init__(self, index_file: str):
+        self.index_file = index_file
+        self.connection = sqlite3.connect(index_file)
+        self.add_version_keys()
+        self.connection.executescript(SCHEMA)
+
+    def add_version_keys(self):
+        """Adds the version key column to an index written before it existed and computes it for all rows.
+        Keys of an older layout (with other version parts) are computed again, rows kept from a previous run would
+        not sort with the new ones otherwise."""
+        columns = [row[1] for row in self.connection.execute("PRAGMA table_info(builds)")]
+        if not columns:
+            return
+        if "version_key" in columns:
+            stored_key = self.connection.execute(
+                "SELECT version_key FROM builds WHERE version_key IS NOT NULL LIMIT 1").fetchone()
+            if stored_key is None or len(stored_key[0]) == len(format_version_key({})):
+                return
+        with self.connection:
+            if "version_key" not in columns:
+                self.connection.execute("ALTER TABLE builds ADD COLUMN version_key TEXT")
+            rows = self.connection.execute("SELECT DISTINCT version, release_name FROM builds").fetchall()
+            self.connection.executemany(
+                "UPDATE builds SET version_key = ? WHERE version IS ? AND release_name IS ?",
+                [(row_version_key(version, release_name), version, release_name) for version, release_name in rows])
+
+    def has_kb(self, kb_id):
+        """True if the KB has been indexed, even if it has no build numbers"""
+        return self.connection.execute("SELECT 1 FROM indexed_kbs WHERE kb_id = ?", (kb_id,)).fetchone() is not None
+
+    def indexed_products(self):
+        """Returns a dict of KB id and product of all indexed KBs"""
+        return dict(self.connection.execute("SELECT kb_id, product FROM indexed_kbs"))
+
+    def replace_kb(self, kb_dataobject):
+        """Replaces all rows of a KB with the builds from its current release tables"""
+        rows = kb_build_rows(kb_dataobject)
+        with self.connection:
+            self.connection.execute("DELETE FROM builds WHERE kb_id = ?", (kb_dataobject.id,))
+            self.connection.executemany(f"INSERT INTO builds VALUES ({', '.join('?' * len(COLUMNS))})", rows)
+            self.connection.execute("INSERT OR REPLACE INTO indexed_kbs VALUES (?, ?)",
+                                    (kb_dataobject.id, kb_dataobject.product))
+        return len(rows)
+
+    def keep_only(self, kb_ids):
+        """Removes the rows of all KBs not in the list, e.g. KBs no longer linked from the master KB"""
+        kb_ids = list(kb_ids)
+        placeholders = ", ".join("?" * len(kb_ids))
+        with self.connection:
+            for table in ("builds", "indexed_kbs"):
+                self.connection.execute(f"DELETE FROM {table} WHERE kb_id NOT IN ({placeholders})", kb_ids)
+
+    def close(self):
+        """Closes the index and rewrites it compacted, with the rows in a fixed order.
+        An index with the same content is byte-identical, whichever KBs were replaced in between."""
+        self.connection.commit()
+        self.connection.close()
+        compact_file = f"{self.index_file}.tmp"
+        if os.path.exists(compact_file):
+            os.remove(compact_file)
+        connection = sqlite3.connect(compact_file)
+        connection.executescript(SCHEMA)
+        connection.execute("ATTACH DATABASE ? AS source", (self.index_file,))
+        with connection:
+            connection.execute("INSERT INTO builds SELECT * FROM source.builds "
+                               "ORDER BY kb_id, table_name, build, build_type, edition, version, release_name")
+            connection.execute("INSERT INTO indexed_kbs SELECT * FROM source.indexed_kbs ORDER BY kb_id")
+        connection.execute("DETACH DATABASE source")
+        connection.execute("ANALYZE")
+        connection.commit()
+        connection.close()
+        os.replace(compact_file, self.index_file)
+
+
+class BuildIndex:
+    """Read-only access to the build index: which product, version and release date has a build number?"""
+
+    def __init__(self, index_file: str):
+        if not os.path.exists(index_file):
+            raise FileNotFoundError(f"No build index at {index_file}")
+        self.connection = sqlite3.connect(f"file:{index_file}?mode=ro", uri=True, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+
+    def lookup(self, build):
+        """Returns all index entries of a build number as a list of dicts"""
+        return self.lookup_many([build]).get(build, [])
+
+    def lookup_many(self, builds):
+        """Returns a dict of build number (as given) and the list of its index entries, unknown builds are left out"""
+        normalized_builds = {}
+        for build in builds:
+            normalized_build = normalize_build_number(build)
+            if normalized_build is not None:
+                normalized_builds.setdefault(normalized_build, []).append(build)
+        results = {}
+        unique_builds = list(normalized_builds)
+        for chunk_start in range(0, len(unique_builds), LOOKUP_CHUNK_SIZE):
+            chunk = unique_builds[chunk_start:chunk_start + LOOKUP_CHUNK_SIZE]
+            query = (f"SELECT {', '.join(COLUMNS)} FROM builds WHERE build IN ({', '.join('?' * len(chunk))}) "
+                     f"ORDER BY kb_id, table_name")
+            for row in self.connection.execute(query, chunk):
+                for build in normalized_builds[row["build"]]:
+                    results.setdefault(build, []).append(dict(row))
+        return results
+
+    def close(self):
+        """Closes the index file"""
+        self.connection.close()
+
+
+def parse_arguments():
+    """Returns the parsed command line arguments"""
+    parser = argparse.ArgumentParser(description="Look up VMware build numbers in the build index")
+    parser.add_argument("builds", nargs="*", help="Build numbers to look up")
+    parser.add_argument("--file", help="Read build numbers from a file, one per line ('-' for stdin)")
+    parser.add_argument("--index", default=os.path.join("outputs", BUILD_INDEX_FILENAME),
+                        help=f"Path of the build index (default: outputs/{BUILD_INDEX_FILENAME})")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    builds = list(args.builds)
+    if args.file:
+        input_fh = sys.stdin if args.file == "-" else open(args.file, "r", encoding="utf-8")
+        with input_fh:
+            builds.extend(line.strip() for line in input_fh if line.strip())
+    build_index = BuildIndex(args.index)
+    matches = build_index.lookup_many(builds)
+    # One JSON line per requested build, unknown builds have no matches
+    for build in builds:
+        print(json.dumps({"build": build, "matches": matches.get(build, [])}))
+    build_index.close()
+    sys.exit(0 if all(build in matches for build in builds) else 1)
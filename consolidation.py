@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+""" consolidation.py: Provides resolution table from VMware KBs as machine-readable json files.
+VMware KBs provide release information only as a human-readable HTML table.
+However, for automation it would be nice to have it in a machine-readable format.
+This script takes the tables from a VMware KB page and provides a json-file as an output.
+
+This program is free software: you can redistribute it and/or modify it under
+the terms of the GNU General Public License as published by the Free Software
+Foundation, either version 3 of the License, or (at your option) any later
+version.
+This program is distributed in the hope that it will be useful, but WITHOUT
+ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+You should have received a copy of the GNU General Public License along with
+this program. If not, see <http://www.gnu.org/licenses/>.
+"""
+
+__author__ = "Dominik Zorgnotti"
+__contact__ = "dominik@why-did-it.fail"
+__created__ = "2026-10-17"
+__deprecated__ = False
+__contact__ = "dominik@why-did-it.fail"
+__license__ = "GPLv3"
+__status__ = "beta"
+__version__ = "0.1.0"
+
+
+import os
+
+import pandas as pd
+
+from data_handling import write_json_file, write_table_file, OUTPUT_FILE_EXTENSIONS, TABLE_FORMATS
+
+CONSOLIDATED_NAME = "all_products_releases"
+# Columns identifying where a release row comes from, they lead the consolidated table
+SOURCE_COLUMNS = ["Product", "KB", "Table", "Edition"]
+CATEGORICAL_COLUMNS = ["Product", "Edition", "Table"]
+# A release is identified by the first of these columns it has a value in
+RELEASE_KEY_COLUMNS = ["Build Number", "VxRail Release"]
+
+
+def aligned_dtype(dtypes):
+    """Returns the dtype a column gets in the consolidated table from its dtypes in the single tables.
+    Integers become nullable, so rows of tables without the column do not turn them into floats."""
+    dtypes = set(dtypes)
+    if any(pd.api.types.is_datetime64_any_dtype(dtype) for dtype in dtypes):
+        return "datetime64[ns]"
+    if all(pd.api.types.is_bool_dtype(dtype) for dtype in dtypes):
+        return "boolean"
+    if all(pd.api.types.is_integer_dtype(dtype) for dtype in dtypes):
+        return "Int64"
+    if all(pd.api.types.is_numeric_dtype(dtype) for dtype in dtypes):
+        return "Float64"
+    return object
+
+
+def align_frame(dataframe, target_dtypes):
+    """Returns a dataframe with its columns converted to the consolidated dtypes, unparseable dates become NaT"""
+    aligned_columns = {}
+    for column_name, column in dataframe.items():
+        if target_dtypes[column_name] == "datetime64[ns]" and not pd.api.types.is_datetime64_any_dtype(column):
+            aligned_columns[column_name] = pd.to_datetime(column, errors="coerce")
+        elif column.dtype != target_dtypes[column_name]:
+            aligned_columns[column_name] = column.astype(target_dtypes[column_name])
+    return dataframe.assign(**aligned_columns) if aligned_columns else dataframe
+
+
+def consolidate_release_tables(kb_tables):
+    """Takes (kb id, product, list of standardized release dataframes) for every KB and returns a single release
+    table of all products. Rows listed more than once are kept and marked in the Duplicate column."""
+    labeled_frames = []
+    for kb_id, product, list_of_dframes in kb_tables:
+        for table_id, dataframe in enumerate(list_of_dframes):
+            labeled_frames.append(dataframe.assign(Product=product, KB=kb_id, Table=f"table{table_id}"))
+    if not labeled_frames:
+        return pd.DataFrame(columns=SOURCE_COLUMNS + ["Duplicate"])
+    column_dtypes = {}
+    for dataframe in labeled_frames:
+        for column_name, dtype in dataframe.dtypes.items():
+            column_dtypes.setdefault(column_name, []).append(dtype)
+    target_dtypes = {column_name: aligned_dtype(dtypes) for column_name, dtypes in column_dtypes.items()}
+    aligned_frames = [align_frame(dataframe, target_dtypes) for dataframe in labeled_frames]
+    consolidated = pd.concat(aligned_frames, ignore_index=True, sort=False)
+    if "Edition" not in consolidated.columns:
+        consolidated["Edition"] = None
+    consolidated = consolidated[SOURCE_COLUMNS + [column_name for column_name in consolidated.columns
+                                                  if column_name not in SOURCE_COLUMNS]]
+    consolidated = consolidated.astype({column_name: "category" for column_name in CATEGORICAL_COLUMNS})
+    consolidated["Duplicate"] = find_duplicates(consolidated)
+    return consolidated
+
+
+def find_duplicates(consolidated):
+    """Returns a boolean series, True for all rows of a release listed more than once in the same KB and edition"""
+    release_key = pd.Series(pd.NA, index=consolidated.index, dtype=object)
+    for key_column in RELEASE_KEY_COLUMNS:
+        if key_column in consolidated.columns:
+            release_key = release_key.fillna(consolidated[key_column].astype(object))
+    keyed = pd.DataFrame({"KB": consolidated["KB"], "Edition": consolidated["Edition"], "Release": release_key})
+    return keyed.duplicated(keep=False) & release_key.notna()
+
+
+def create_consolidated_outputs(consolidated, output_base_dir: str, output_formats, compact: bool = False,
+                                compressions=()):
+    """Writes the consolidated release table in all requested output formats next to the per-KB files.
+    The index orientation is left out, a release may be listed several times. Returns the list of files written."""
+    written_files = []
+    for output_format in output_formats:
+        if output_format == "index":
+            continue
+        outputdir = os.path.join(output_base_dir, output_format)
+        if not os.path.exists(outputdir):
+            os.makedirs(outputdir)
+        output_file = os.path.join(outputdir, f"{CONSOLIDATED_NAME}_as-{output_format}."
+                                              f"{OUTPUT_FILE_EXTENSIONS.get(output_format, 'json')}")
+        if output_format in TABLE_FORMATS:
+            written_files.append(write_table_file(consolidated, output_file, output_format))
+        else:
+            written_files.extend(write_json_file(consolidated, output_file, output_format, compact, compressions))
+    return written_files
@@ -24,62 +24,195 @@ __license__ = "GPLv3"
 __status__ = "beta"
 __version__ = "0.3.0"
 
+import gzip
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 
+import pandas as pd
 
-def create_json_output(kb_dataobject, output_base_dir: str, record_type: str):
-    """Takes a list of dataframes from a KB object, an relative output directory and a JSON data"""
-    outputdir = os.path.join(output_base_dir, record_type)
-    if not os.path.exists(outputdir):
-        os.makedirs(outputdir)
-    # TODO Code repeat make this DRY anytime soon
-    table_id = 0
-    for dataframe in kb_dataobject.list_of_dframes:
-        filename = f"kb{kb_dataobject.id}_{kb_dataobject.fmt_product}_table{table_id}_release_as-{record_type}.json"
-        if "Build Number" in dataframe.columns and record_type == "index":
-            dataframe = transform_index(dataframe)
-        # Adding vxrail handling
-        elif kb_dataobject.id == 52075 and record_type == "index":
-            dataframe = transform_kb52075_index(dataframe)
-        try:
-            dataframe.to_json(
-                f"{outputdir}{os.sep}{filename}",
-                indent=4, orient=record_type, date_format="iso"
-            )
-        except ValueError as err:
-            print(f"{kb_dataobject.id}: Error for json {record_type} in table {table_id}: {err}")
-        finally:
-            table_id += 1
+import instrumentation
+from date_parsing import parse_dates
+
+# Parquet and Arrow IPC files need pyarrow, precompressed .json.br files need brotli
+try:
+    import pyarrow
+    import pyarrow.feather
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# The JSON data orientations written by default
+JSONRECORDS = ["records", "table", "index"]
+# Line-oriented and columnar formats, written in addition to or instead of the JSON orientations
+TABLE_FORMATS = ["ndjson", "parquet", "arrow"]
+OUTPUT_FORMATS = JSONRECORDS + TABLE_FORMATS
+OUTPUT_FILE_EXTENSIONS = {"ndjson": "ndjson", "parquet": "parquet", "arrow": "arrow"}
+# Precompressed copies of the JSON orientation files, as .json.gz or .json.br
+COMPRESSIONS = {"gzip": "gz", "br": "br"}
+# Number of threads serializing and writing files in parallel
+DEFAULT_WRITE_WORKERS = 4
+# Written as a timestamp column in parquet and arrow files, whatever type the table has
+RELEASE_DATE_COLUMN = "Release Date"
+
+
+def missing_dependencies(output_formats, compressions=()):
+    """Returns a list of messages for the selected output formats and compressions whose libraries are missing"""
+    missing = [f"the {output_format} format needs pyarrow" for output_format in output_formats
+               if output_format in ("parquet", "arrow") and pyarrow is None]
+    if "br" in compressions and brotli is None:
+        missing.append("the br compression needs brotli")
+    return missing
+
+
+def create_json_output(kb_dataobject, output_base_dir: str, record_type: str, compact: bool = False):
+    """Takes a list of dataframes from a KB object, an relative output directory and a JSON data.
+    Returns the list of files written."""
+    return create_json_outputs(kb_dataobject, output_base_dir, record_types=[record_type], compact=compact)
+
+
+def create_json_outputs(kb_dataobject, output_base_dir: str, record_types=None, compact: bool = False,
+                        max_workers: int = DEFAULT_WRITE_WORKERS, compressions=()):
+    """Writes every table of a KB object in all requested output formats (JSON orientations, ndjson, parquet, arrow),
+    going over each table once. The tables of the KB object are not modified. By default the JSON files are indented
+    with 4 spaces, with compact=True they are written without any whitespace. Every compression adds a precompressed
+    copy of each JSON orientation file.
+    Returns the list of files written."""
+    record_types = JSONRECORDS if record_types is None else record_types
+    for record_type in record_types:
+        outputdir = os.path.join(output_base_dir, record_type)
+        if not os.path.exists(outputdir):
+            os.makedirs(outputdir)
+    # One task per table with all its files, pandas objects are not safe to serialize from several threads at once
+    table_tasks = []
+    for table_id, dataframe in enumerate(kb_dataobject.list_of_dframes):
+        index_frame = None
+        if "index" in record_types:
+            if "Build Number" in dataframe.columns:
+                index_frame = transform_index(dataframe)
+            # Adding vxrail handling
+            elif kb_dataobject.id == 52075:
+                index_frame = transform_kb52075_index(dataframe)
+        write_tasks = []
+        for record_type in record_types:
+            filename = (f"kb{kb_dataobject.id}_{kb_dataobject.fmt_product}_table{table_id}_release_as-{record_type}."
+                        f"{OUTPUT_FILE_EXTENSIONS.get(record_type, 'json')}")
+            output_frame = index_frame if record_type == "index" and index_frame is not None else dataframe
+            write_tasks.append((output_frame, record_type, os.path.join(output_base_dir, record_type, filename),
+                                f"table {table_id}"))
+        table_tasks.append(write_tasks)
     if kb_dataobject.list_of_merged_frames:
-        table_id = 0
-        for table_name, dataframe in kb_dataobject.list_of_merged_frames.items():
-            filename = f"kb{kb_dataobject.id}_{kb_dataobject.fmt_product}_{table_name}_as-{record_type}.json"
-            if "Build Number" in dataframe.columns and record_type == "index":
-                dataframe = transform_index(dataframe)
+        for table_id, (table_name, dataframe) in enumerate(kb_dataobject.list_of_merged_frames.items()):
+            index_frame = None
+            if "index" in record_types and "Build Number" in dataframe.columns:
+                index_frame = transform_index(dataframe)
+            write_tasks = []
+            for record_type in record_types:
+                filename = (f"kb{kb_dataobject.id}_{kb_dataobject.fmt_product}_{table_name}_as-{record_type}."
+                            f"{OUTPUT_FILE_EXTENSIONS.get(record_type, 'json')}")
+                output_frame = index_frame if record_type == "index" and index_frame is not None else dataframe
+                write_tasks.append((output_frame, record_type, os.path.join(output_base_dir, record_type, filename),
+                                    f"merged table {table_id}"))
+            table_tasks.append(write_tasks)
+
+    def write_table_task(write_tasks):
+        results = []
+        for output_frame, record_type, output_file, table_label in write_tasks:
+            start = time.perf_counter()
             try:
-                dataframe.to_json(
-                    f"{outputdir}{os.sep}{filename}",
-                    indent=4, orient=record_type, date_format="iso"
-                )
+                if record_type in TABLE_FORMATS:
+                    output_files = [write_table_file(output_frame, output_file, record_type)]
+                else:
+                    output_files = write_json_file(output_frame, output_file, record_type, compact, compressions)
             except ValueError as err:
-                print(f"{kb_dataobject.id}: Error for json {record_type} in merged table {table_id}: {err}")
+                print(f"{kb_dataobject.id}: Error for json {record_type} in {table_label}: {err}")
+                output_files = []
+            results.append((record_type, output_files, time.perf_counter() - start))
+        return results
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        results = [result for table_results in executor.map(write_table_task, table_tasks)
+                   for result in table_results]
+    written_files = []
+    for record_type in record_types:
+        record_files = [output_file for task_type, output_files, _ in results if task_type == record_type
+                        for output_file in output_files]
+        record_seconds = sum(seconds for task_type, _, seconds in results if task_type == record_type)
+        instrumentation.record_output(kb_dataobject.id, record_type, record_seconds, record_files)
+        written_files.extend(record_files)
+    return written_files
+
+
+def write_json_file(dataframe, output_file: str, record_type: str, compact: bool = False, compressions=()):
+    """Serializes a dataframe in one JSON orientation and writes it to a file, plus one precompressed copy per
+    compression. Returns the list of files written."""
+    json_data = dataframe.to_json(indent=0 if compact else 4, orient=record_type, date_format="iso")
+    with open(output_file, "w", encoding="utf-8") as output_fh:
+        output_fh.write(json_data)
+    output_files = [output_file]
+    for compression in compressions:
+        compressed_file = f"{output_file}.{COMPRESSIONS[compression]}"
+        json_bytes = json_data.encode("utf-8")
+        if compression == "gzip":
+            # No timestamp in the header, unchanged files stay byte-identical across runs
+            compressed_data = gzip.compress(json_bytes, compresslevel=9, mtime=0)
+        else:
+            compressed_data = brotli.compress(json_bytes, mode=brotli.MODE_TEXT)
+        with open(compressed_file, "wb") as output_fh:
+            output_fh.write(compressed_data)
+        output_files.append(compressed_file)
+    return output_files
+
+
+def stable_table_frame(dataframe):
+    """Returns a copy of a release table with a dtype layout that does not depend on the cell contents:
+    date columns and the Release Date column become timestamps, all other columns nullable strings, the index a
+    regular column. Release dates the KB parser left as text (e.g. KB52075) are parsed here, cells that are no date
+    are empty in the timestamp column."""
+    dataframe = dataframe.reset_index(drop=isinstance(dataframe.index, pd.RangeIndex))
+    columns = {}
+    for column_name, column in dataframe.items():
+        if column_name == RELEASE_DATE_COLUMN and not pd.api.types.is_datetime64_any_dtype(column):
+            column, _, _ = parse_dates(column)
+        if pd.api.types.is_datetime64_any_dtype(column):
+            columns[str(column_name)] = column.astype("datetime64[ns]")
+            continue
+        # Integers with empty cells are read as floats, they are still written as 17694817 and not 17694817.0
+        if pd.api.types.is_float_dtype(column) and (column.dropna() % 1 == 0).all():
+            column = column.astype("Int64")
+        columns[str(column_name)] = column.astype(object).where(column.isna(), column.astype(str)).astype("string")
+    return pd.DataFrame(columns)
+
+
+def write_table_file(dataframe, output_file: str, output_format: str):
+    """Writes a release table as ndjson, parquet or arrow (IPC) file and returns its name"""
+    if output_format == "ndjson":
+        dataframe.to_json(output_file, orient="records", lines=True, date_format="iso")
+        return output_file
+    arrow_table = pyarrow.Table.from_pandas(stable_table_frame(dataframe), preserve_index=False)
+    if output_format == "parquet":
+        pyarrow.parquet.write_table(arrow_table, output_file, compression="zstd")
+    else:
+        # Uncompressed, so readers can memory-map the file
+        pyarrow.feather.write_feather(arrow_table, output_file, compression="uncompressed")
+    return output_file
 
 
 def transform_index(dataframe):
-    """Takes a dataframe as an input and re-creates the index based on the vxrail release. Destructive to the dataframe
-    as duplicates are erased"""
-    dataframe.drop_duplicates(subset="Build Number", keep=False, inplace=True)
-    dataframe.reset_index(drop=True)
-    dataframe.set_index("Build Number", inplace=True)
-    return dataframe
+    """Takes a dataframe as an input and returns a copy indexed by the build number.
+    Build numbers listed more than once are dropped."""
+    return dataframe.drop_duplicates(subset="Build Number", keep=False).set_index("Build Number")
+
 
 def transform_kb52075_index(dataframe):
-    """Takes the vxrail dataframe as an input and re-creates the index based on the build number. Destructive to the dataframe
-        as duplicates are erased"""
-    dataframe.drop_duplicates(subset="VxRail Release", keep=False, inplace=True)
-    dataframe.reset_index(drop=True)
-    dataframe.set_index("VxRail Release", inplace=True)
-    return dataframe
+    """Takes the vxrail dataframe as an input and returns a copy indexed by the vxrail release.
+    Releases listed more than once are dropped."""
+    return dataframe.drop_duplicates(subset="VxRail Release", keep=False).set_index("VxRail Release")
+
 
 def standardize_columns(dataframe):
     """Takes a dataframe as an input and renames the columns to a common standard"""
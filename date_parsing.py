@@ -0,0 +1,152 @@
+#!/usr/bin/env python
+""" date_parsing.py: Provides resolution table from VMware KBs as machine-readable json files.
+VMware KBs provide release information only as a human-readable HTML table.
+However, for automation it would be nice to have it in a machine-readable format.
+This script takes the tables from a VMware KB page and provides a json-file as an output.
+
+This program is free software: you can redistribute it and/or modify it under
+the terms of the GNU General Public License as published by the Free Software
+Foundation, either version 3 of the License, or (at your option) any later
+version.
+This program is distributed in the hope that it will be useful, but WITHOUT
+ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+You should have received a copy of the GNU General Public License along with
+this program. If not, see <http://www.gnu.org/licenses/>.
+"""
+
+__author__ = "Dominik Zorgnotti"
+__contact__ = "dominik@why-did-it.fail"
+__created__ = "2026-10-17"
+__deprecated__ = False
+__contact__ = "dominik@why-did-it.fail"
+__license__ = "GPLv3"
+__status__ = "beta"
+__version__ = "0.1.0"
+
+
+import json
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+
+try:
+    from pandas.tseries.api import guess_datetime_format
+except ImportError:  # Public only since pandas 2.2
+    from pandas._libs.tslibs.parsing import guess_datetime_format
+
+DATE_FORMATS_FILENAME = "date_formats.json"
+# Formats tried in addition to the one guessed from the first value
+CANDIDATE_FORMATS = ["%m/%d/%Y", "%Y-%m-%d", "%m-%d-%Y", "%Y/%m/%d", "%b %d, %Y", "%B %d, %Y", "%d %b %Y",
+                     "%d %B %Y", "%m/%d/%y"]
+# Number of distinct values a format is detected from
+SAMPLE_SIZE = 20
+# Columns up to this many rows are parsed without detecting a format, like the release tables of the KBs
+SMALL_COLUMN_SIZE = 1000
+
+
+def parse_with_format(values, date_format):
+    """Parses an array of strings with a fixed format, values not matching it become NaT"""
+    # The values are distinct already, pandas' own cache of repeated values would only cost time
+    return pd.to_datetime(values, format=date_format, errors="coerce", cache=False)
+
+
+def detect_date_format(sample_values):
+    """Returns the format parsing most of the sample values, None if no format parses any of them"""
+    if len(sample_values) == 0:
+        return None
+    # No format can parse more values than the generic parser, e.g. placeholders like "TBD"
+    parseable_count = pd.to_datetime(sample_values, errors="coerce", cache=False).notna().sum()
+    best_format, best_count = None, 0
+    for candidate_format in CANDIDATE_FORMATS:
+        parsed_count = parse_with_format(sample_values, candidate_format).notna().sum()
+        if parsed_count > best_count:
+            best_format, best_count = candidate_format, parsed_count
+        if best_count >= parseable_count:
+            break
+    return best_format
+
+
+def parse_with_likely_format(unique_values, known_format=None):
+    """Parses the distinct values with the known format (e.g. from a previous run) or else the format pandas guesses
+    from the first value. A format is taken if it parses the whole sample, every value is parsed only once.
+    Returns a tuple of (parsed values, format), (None, None) if neither format fits."""
+    sample_values = unique_values[:SAMPLE_SIZE]
+    sample_dates = sample_values != ""
+    for candidate_format in (known_format, guess_datetime_format(unique_values[0]) if len(unique_values) else None):
+        if candidate_format is None:
+            continue
+        parsed_values = parse_with_format(unique_values, candidate_format)
+        if parsed_values[:SAMPLE_SIZE].notna()[sample_dates].all():
+            return parsed_values, candidate_format
+    return None, None
+
+
+def parse_dates(column, known_format=None):
+    """Parses a column of date strings. Small columns go through the generic parser as they are. In larger ones only
+    the distinct values are parsed and mapped back to the rows, with the known or guessed format or else the format
+    detected from a sample. Values not matching the format get a second chance with the generic parser.
+    Returns a tuple of (datetime series, detected format or None, list of values that could not be parsed)."""
+    if pd.api.types.is_datetime64_any_dtype(column):
+        return column, known_format, []
+    if len(column) <= SMALL_COLUMN_SIZE:
+        # On a few hundred rows detecting a format and factorizing cost more than they save
+        codes, date_format = None, None
+        values = np.array(["" if pd.isna(value) else str(value).strip() for value in column], dtype=object)
+        parsed_values = pd.to_datetime(values, errors="coerce", cache=False)
+    else:
+        codes, values = pd.factorize(column)
+        values = np.array([str(value).strip() for value in values], dtype=object)
+        parsed_values, date_format = parse_with_likely_format(values, known_format)
+        if parsed_values is None:
+            date_format = detect_date_format(values[:SAMPLE_SIZE][values[:SAMPLE_SIZE] != ""])
+            if date_format is not None:
+                parsed_values = parse_with_format(values, date_format)
+            else:
+                parsed_values = pd.DatetimeIndex([pd.NaT] * len(values))
+        unparsed = parsed_values.isna()
+        if unparsed.any():
+            parsed_values = parsed_values.where(~unparsed, pd.to_datetime(
+                np.where(unparsed, values, None), errors="coerce", cache=False))
+    unparsed_values = list(dict.fromkeys(values[parsed_values.isna() & (values != "")]))
+    if codes is not None:
+        # Empty cells have the code -1 and pick the NaT appended at the end
+        parsed_values = parsed_values.append(pd.DatetimeIndex([pd.NaT])).take(codes)
+    return pd.Series(parsed_values, index=column.index, name=column.name), date_format, unparsed_values
+
+
+class DateFormatCache:
+    """Remembers the detected date format of every KB and column across runs in a JSON file"""
+
+    def __init__(self, cache_dir: str):
+        self.cache_file = os.path.join(cache_dir, DATE_FORMATS_FILENAME)
+        self.formats = self.load()
+
+    def load(self):
+        """Returns the formats of the previous runs as a dict of KB id and {column key: format}"""
+        if not os.path.exists(self.cache_file):
+            return {}
+        try:
+            with open(self.cache_file, "r", encoding="utf-8") as cache_fh:
+                return json.load(cache_fh)
+        except (OSError, ValueError) as err:
+            logging.warning(f"Ignoring unreadable date format cache {self.cache_file}: {err}")
+            return {}
+
+    def get(self, kb_id):
+        """Returns the known formats of a KB as a dict of column key and format"""
+        return dict(self.formats.get(str(kb_id), {}))
+
+    def update(self, kb_id, date_formats):
+        """Stores the detected formats of a KB"""
+        self.formats.setdefault(str(kb_id), {}).update(date_formats)
+
+    def save(self):
+        """Atomically writes the formats to the cache file"""
+        os.makedirs(os.path.dirname(self.cache_file) or ".", exist_ok=True)
+        temp_file = f"{self.cache_file}.tmp"
+        with open(temp_file, "w", encoding="utf-8") as cache_fh:
+            json.dump(self.formats, cache_fh, indent=4, sort_keys=True)
+        os.replace(temp_file, self.cache_file)
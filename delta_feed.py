@@ -0,0 +1,197 @@
+#!/usr/bin/env python
+""" delta_feed.py: Provides resolution table from VMware KBs as machine-readable json files.
+VMware KBs provide release information only as a human-readable HTML table.
+However, for automation it would be nice to have it in a machine-readable format.
+This script takes the tables from a VMware KB page and provides a json-file as an output.
+
+This program is free software: you can redistribute it and/or modify it under
+the terms of the GNU General Public License as published by the Free Software
+Foundation, either version 3 of the License, or (at your option) any later
+version.
+This program is distributed in the hope that it will be useful, but WITHOUT
+ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+You should have received a copy of the GNU General Public License along with
+this program. If not, see <http://www.gnu.org/licenses/>.
+"""
+
+__author__ = "Dominik Zorgnotti"
+__contact__ = "dominik@why-did-it.fail"
+__created__ = "2026-10-17"
+__deprecated__ = False
+__contact__ = "dominik@why-did-it.fail"
+__license__ = "GPLv3"
+__status__ = "beta"
+__version__ = "0.1.0"
+
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import shutil
+from datetime import datetime, timezone
+
+from build_index import format_cell, normalize_build_number
+
+DELTA_DIRNAME = "delta"
+SNAPSHOT_FILENAME = "snapshot.json.gz"
+# Changes of the last run only, for consumers polling after every run
+LATEST_FILENAME = "latest.ndjson"
+# All changes of all runs, appended
+FEED_FILENAME = "changes.ndjson"
+CHANGELOG_DIRNAME = "changelog"
+# Rows are identified by the first of these columns a table has, KB52075 (vxrail) has no build number column
+ROW_KEY_COLUMNS = ["Build Number", "VxRail Release"]
+
+
+def row_key_column(dataframe):
+    """Returns the column identifying the rows of a release table, None if it has none"""
+    return next((column for column in ROW_KEY_COLUMNS if column in dataframe.columns), None)
+
+
+def snapshot_rows(kb_dataobject):
+    """Returns the rows of all release tables of a KB object as a dict of "table/key" and the row as strings.
+    A key listed more than once in a table gets its occurrence appended, e.g. "table0/17694817#2"."""
+    rows = {}
+    for table_id, dataframe in enumerate(kb_dataobject.list_of_dframes):
+        key_column = row_key_column(dataframe)
+        if key_column is None:
+            continue
+        column_names = [str(column_name) for column_name in dataframe.columns]
+        for values in zip(*(dataframe[column_name].tolist() for column_name in dataframe.columns)):
+            row = dict(zip(column_names, (format_cell(value) for value in values)))
+            key = normalize_build_number(row[key_column]) if key_column == "Build Number" else row[key_column]
+            if key is None:
+                continue
+            row_key = f"table{table_id}/{key}"
+            occurrence = 1
+            while row_key in rows:
+                occurrence += 1
+                row_key = f"table{table_id}/{key}#{occurrence}"
+            rows[row_key] = row
+    return rows
+
+
+def row_hash(row):
+    """Returns a hash of a snapshot row, independent of the column order"""
+    return hashlib.sha1(json.dumps(row, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def compare_rows(previous_rows, current_rows):
+    """Returns the sets of added, removed and modified row keys between two snapshots of a KB"""
+    previous_keys, current_keys = set(previous_rows), set(current_rows)
+    modified = {row_key for row_key in previous_keys & current_keys
+                if row_hash(previous_rows[row_key]) != row_hash(current_rows[row_key])}
+    return current_keys - previous_keys, previous_keys - current_keys, modified
+
+
+class DeltaFeed:
+    """Compares the release rows of a run with the snapshot of the previous run and writes the differences as
+    NDJSON feed and changelog to the delta directory of the outputs"""
+
+    def __init__(self, output_base_dir: str, staging_dir=None):
+        self.delta_dir = os.path.join(output_base_dir, DELTA_DIRNAME)
+        self.snapshot_file = os.path.join(self.delta_dir, SNAPSHOT_FILENAME)
+        # The files of this run are written to a staging directory first, if any
+        self.target_dir = os.path.join(staging_dir or output_base_dir, DELTA_DIRNAME)
+        self.run_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        self.previous_kbs = self.load()
+        # Without a previous snapshot this run is the baseline, nothing is reported as added
+        self.baseline = self.previous_kbs is None
+        self.previous_kbs = self.previous_kbs or {}
+        self.current_kbs = {}
+        self.changes = []
+
+    def load(self):
+        """Returns the rows of the previous run as a dict of KB id and snapshot rows, None without a snapshot"""
+        if not os.path.exists(self.snapshot_file):
+            return None
+        try:
+            with gzip.open(self.snapshot_file, "rt", encoding="utf-8") as snapshot_fh:
+                return json.load(snapshot_fh)["kbs"]
+        except (OSError, ValueError, KeyError) as err:
+            logging.warning(f"Ignoring unreadable delta snapshot {self.snapshot_file}: {err}")
+            return None
+
+    def has_kb(self, kb_id):
+        """True if the previous snapshot has the rows of a KB"""
+        return str(kb_id) in self.previous_kbs
+
+    def update_kb(self, kb_dataobject):
+        """Compares the rows of a KB with the previous snapshot and records the changes"""
+        kb_id = str(kb_dataobject.id)
+        current_rows = snapshot_rows(kb_dataobject)
+        self.current_kbs[kb_id] = current_rows
+        if self.baseline:
+            return
+        previous_rows = self.previous_kbs.get(kb_id, {})
+        added, removed, modified = compare_rows(previous_rows, current_rows)
+        self.record_changes(kb_id, "added", added, previous_rows, current_rows)
+        self.record_changes(kb_id, "removed", removed, previous_rows, current_rows)
+        self.record_changes(kb_id, "modified", modified, previous_rows, current_rows)
+
+    def record_changes(self, kb_id, change, row_keys, previous_rows, current_rows):
+        """Adds one feed entry per changed row"""
+        for row_key in sorted(row_keys):
+            table_name, key = row_key.split("/", 1)
+            entry = {"timestamp": self.run_at, "change": change, "kb_id": int(kb_id), "table": table_name, "key": key}
+            if change != "removed":
+                entry["row"] = current_rows[row_key]
+            if change != "added":
+                entry["previous_row"] = previous_rows[row_key]
+            self.changes.append(entry)
+
+    def finish(self, active_kb_ids):
+        """Carries the rows of active KBs that were not rebuilt (unchanged or failed) over to the new snapshot,
+        KBs no longer active are reported as removed"""
+        for kb_id, previous_rows in self.previous_kbs.items():
+            if kb_id in self.current_kbs:
+                continue
+            if int(kb_id) in active_kb_ids:
+                self.current_kbs[kb_id] = previous_rows
+            else:
+                self.record_changes(kb_id, "removed", previous_rows, previous_rows, {})
+
+    def changelog(self):
+        """Returns the summary of this run: number of added, removed and modified rows in total and per KB"""
+        kbs = {}
+        for entry in self.changes:
+            kb_counts = kbs.setdefault(str(entry["kb_id"]), {"added": 0, "removed": 0, "modified": 0})
+            kb_counts[entry["change"]] += 1
+        return {
+            "run_at": self.run_at,
+            "baseline": self.baseline,
+            "added": sum(kb_counts["added"] for kb_counts in kbs.values()),
+            "removed": sum(kb_counts["removed"] for kb_counts in kbs.values()),
+            "modified": sum(kb_counts["modified"] for kb_counts in kbs.values()),
+            "kbs": kbs,
+        }
+
+    def write(self):
+        """Writes the changes of this run, appends them to the feed, writes the changelog and the new snapshot.
+        Returns the changelog."""
+        os.makedirs(os.path.join(self.target_dir, CHANGELOG_DIRNAME), exist_ok=True)
+        feed_file = os.path.join(self.target_dir, FEED_FILENAME)
+        # The feed is appended to, it starts from the published one
+        if self.target_dir != self.delta_dir and os.path.exists(os.path.join(self.delta_dir, FEED_FILENAME)):
+            shutil.copyfile(os.path.join(self.delta_dir, FEED_FILENAME), feed_file)
+        change_lines = "".join(json.dumps(entry, sort_keys=True) + "\n" for entry in self.changes)
+        with open(os.path.join(self.target_dir, LATEST_FILENAME), "w", encoding="utf-8") as latest_fh:
+            latest_fh.write(change_lines)
+        with open(feed_file, "a", encoding="utf-8") as feed_fh:
+            feed_fh.write(change_lines)
+        changelog = self.changelog()
+        changelog_name = self.run_at.replace(":", "").replace("+0000", "Z")
+        with open(os.path.join(self.target_dir, CHANGELOG_DIRNAME, f"{changelog_name}.json"), "w",
+                  encoding="utf-8") as changelog_fh:
+            json.dump(changelog, changelog_fh, indent=4, sort_keys=True)
+        snapshot_file = os.path.join(self.target_dir, SNAPSHOT_FILENAME)
+        temp_file = f"{snapshot_file}.tmp"
+        # No timestamp in the gzip header, an unchanged snapshot stays byte-identical
+        with open(temp_file, "wb") as snapshot_fh:
+            snapshot_fh.write(gzip.compress(json.dumps({"kbs": self.current_kbs}, sort_keys=True).encode("utf-8"),
+                                            mtime=0))
+        os.replace(temp_file, snapshot_file)
+        return changelog
@@ -0,0 +1,273 @@
+#!/usr/bin/env python
+""" instrumentation.py: Provides resolution table from VMware KBs as machine-readable json files.
+VMware KBs provide release information only as a human-readable HTML table.
+However, for automation it would be nice to have it in a machine-readable format.
+This script takes the tables from a VMware KB page and provides a json-file as an output.
+
+This program is free software: you can redistribute it and/or modify it under
+the terms of the GNU General Public License as published by the Free Software
+Foundation, either version 3 of the License, or (at your option) any later
+version.
+This program is distributed in the hope that it will be useful, but WITHOUT
+ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+You should have received a copy of the GNU General Public License along with
+this program. If not, see <http://www.gnu.org/licenses/>.
+"""
+
+__author__ = "Dominik Zorgnotti"
+__contact__ = "dominik@why-did-it.fail"
+__created__ = "2026-10-17"
+__deprecated__ = False
+__contact__ = "dominik@why-did-it.fail"
+__license__ = "GPLv3"
+__status__ = "beta"
+__version__ = "0.1.0"
+
+import cProfile
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+try:
+    import resource
+except ImportError:  # Not available on Windows, no peak RSS there
+    resource = None
+
+REPORT_FILENAME = "run_report.json"
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+# The report hot paths write to, None while instrumentation is off
+_active_report = None
+
+
+def peak_rss_bytes(children: bool = False):
+    """Returns the peak resident set size of this process (or of its finished child processes), None if unknown"""
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+def current_rss_bytes():
+    """Returns the current resident set size of this process, the peak where the current size is unknown"""
+    try:
+        with open("/proc/self/statm", "r") as statm_fh:
+            return int(statm_fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return peak_rss_bytes()
+
+
+def configure_logging(level: str = "INFO"):
+    """Sets up logging to stderr, so the logging calls of the pipeline are actually shown"""
+    logging.basicConfig(level=getattr(logging, level.upper()), format=LOG_FORMAT)
+
+
+class RunReport:
+    """Collects per-stage and per-KB measurements of a run and writes them as JSON"""
+
+    def __init__(self, profile_dir=None):
+        self.profile_dir = profile_dir
+        self.started_at = datetime.now(timezone.utc)
+        self._start = time.perf_counter()
+        self.stages = {}
+        self.profilers = {}
+        self.kbs = {}
+        self.memory_budget = None
+        # Fetches are recorded from several threads
+        self._lock = threading.Lock()
+        # Per thread, the stages entered and not yet left
+        self._open_stages = threading.local()
+
+    def kb_entry(self, kb_id):
+        """Returns the report entry for a KB id, created on first use"""
+        return self.kbs.setdefault(str(kb_id), {"outputs": {}})
+
+    @contextmanager
+    def stage(self, stage_name: str):
+        """Times a stage of the run, a stage may be entered several times and its time adds up.
+        A stage entered within another one (e.g. the streaming fetch while waiting for the next KB to parse) only
+        counts for the inner stage. With a profile directory the stage is also profiled, see write_profiles()."""
+        open_stages = self._open_stages.__dict__.setdefault("stack", [])
+        outer_profiler = open_stages[-1]["profiler"] if open_stages else None
+        if outer_profiler is not None:
+            outer_profiler.disable()
+        profiler = None
+        if self.profile_dir is not None:
+            profiler = self.profilers.setdefault(stage_name, cProfile.Profile())
+            profiler.enable()
+        open_stage = {"profiler": profiler, "nested_seconds": 0.0}
+        open_stages.append(open_stage)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            if profiler is not None:
+                profiler.disable()
+            open_stages.pop()
+            if open_stages:
+                open_stages[-1]["nested_seconds"] += seconds
+            if outer_profiler is not None:
+                outer_profiler.enable()
+            with self._lock:
+                stage_entry = self.stages.setdefault(stage_name, {"seconds": 0.0, "calls": 0})
+                stage_entry["seconds"] += seconds - open_stage["nested_seconds"]
+                stage_entry["calls"] += 1
+
+    def timed_iter(self, iterable, stage_name: str):
+        """Yields from an iterable, the time spent waiting for each item is added to the stage"""
+        iterator = iter(iterable)
+        while True:
+            with self.stage(stage_name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def record_fetch(self, kb_id, seconds: float, payload_bytes: int, source: str, retries: int = 0):
+        """Stores the latency and payload size of fetching a KB article, where it came from and how many retries
+        it took"""
+        with self._lock:
+            self.kb_entry(kb_id)["fetch"] = {"seconds": seconds, "payload_bytes": payload_bytes, "source": source,
+                                             "retries": retries}
+
+    def record_parse(self, kb_id, seconds: float, table_count: int, row_count: int, unparsed_dates=None):
+        """Stores the parse time, the number of tables and rows of a KB and the release dates that could not be parsed"""
+        with self._lock:
+            self.kb_entry(kb_id)["parse"] = {"seconds": seconds, "tables": table_count, "rows": row_count}
+            if unparsed_dates:
+                self.kb_entry(kb_id)["parse"]["unparsed_dates"] = unparsed_dates
+
+    def record_output(self, kb_id, record_type: str, seconds: float, output_files):
+        """Stores the serialization time and bytes written of a KB for one output type"""
+        bytes_written = sum(os.path.getsize(output_file) for output_file in output_files)
+        with self._lock:
+            self.kb_entry(kb_id)["outputs"][record_type] = {
+                "seconds": seconds, "bytes": bytes_written, "files": len(output_files),
+            }
+
+    def record_status(self, kb_id, status: str, error=None):
+        """Stores the outcome of a KB: rebuilt, unchanged or failed"""
+        with self._lock:
+            entry = self.kb_entry(kb_id)
+            entry["status"] = status
+            if error is not None:
+                entry["error"] = error
+
+    def record_memory_budget(self, budget_bytes: int, exceeded: bool):
+        """Stores the memory budget of the run and whether the peak resident memory went over it"""
+        self.memory_budget = {"budget_bytes": budget_bytes, "exceeded": exceeded}
+
+    def as_dict(self):
+        """Returns the report with totals over all KBs"""
+        fetches = [entry["fetch"] for entry in self.kbs.values() if "fetch" in entry]
+        parses = [entry["parse"] for entry in self.kbs.values() if "parse" in entry]
+        outputs = [output for entry in self.kbs.values() for output in entry["outputs"].values()]
+        return {
+            "started_at": self.started_at.isoformat(),
+            "duration_seconds": time.perf_counter() - self._start,
+            "stages": self.stages,
+            "peak_rss_bytes": peak_rss_bytes(),
+            "peak_rss_children_bytes": peak_rss_bytes(children=True),
+            "memory_budget": self.memory_budget,
+            "totals": {
+                "kbs": len(self.kbs),
+                "fetch_seconds": sum(fetch["seconds"] for fetch in fetches),
+                "payload_bytes": sum(fetch["payload_bytes"] for fetch in fetches),
+                "fetch_retries": sum(fetch["retries"] for fetch in fetches),
+                "parse_seconds": sum(parse["seconds"] for parse in parses),
+                "tables": sum(parse["tables"] for parse in parses),
+                "rows": sum(parse["rows"] for parse in parses),
+                "serialization_seconds": sum(output["seconds"] for output in outputs),
+                "bytes_written": sum(output["bytes"] for output in outputs),
+            },
+            "kbs": self.kbs,
+        }
+
+    def write(self, output_base_dir: str):
+        """Writes the report as run_report.json to the output directory and returns its path"""
+        report_file = os.path.join(output_base_dir, REPORT_FILENAME)
+        with open(report_file, "w", encoding="utf-8") as report_fh:
+            json.dump(self.as_dict(), report_fh, indent=4, sort_keys=True)
+        self.write_profiles()
+        return report_file
+
+    def write_profiles(self):
+        """Dumps the profile of every stage as <stage>.pstats to the profile directory"""
+        if self.profile_dir is None:
+            return
+        os.makedirs(self.profile_dir, exist_ok=True)
+        for stage_name, profiler in self.profilers.items():
+            profiler.dump_stats(os.path.join(self.profile_dir, f"{stage_name}.pstats"))
+
+
+def activate(report):
+    """Makes the report the target of the hot path instrumentation"""
+    global _active_report
+    _active_report = report
+
+
+def deactivate():
+    """Turns the hot path instrumentation off"""
+    global _active_report
+    _active_report = None
+
+
+def get_active_report():
+    """Returns the active report or None"""
+    return _active_report
+
+
+def record_fetch(kb_id, seconds: float, payload_bytes: int, source: str, retries: int = 0):
+    """Hot path hook for get_kb_webdata, does nothing without an active report"""
+    if _active_report is not None:
+        _active_report.record_fetch(kb_id, seconds, payload_bytes, source, retries)
+
+
+def record_parse(kb_id, seconds: float, table_count: int, row_count: int, unparsed_dates=None):
+    """Hot path hook for parsing a KB, does nothing without an active report"""
+    if _active_report is not None:
+        _active_report.record_parse(kb_id, seconds, table_count, row_count, unparsed_dates)
+
+
+def record_output(kb_id, record_type: str, seconds: float, output_files):
+    """Hot path hook for create_json_output, does nothing without an active report"""
+    if _active_report is not None:
+        _active_report.record_output(kb_id, record_type, seconds, output_files)
+
+
+def record_status(kb_id, status: str, error=None):
+    """Records the outcome of a KB, does nothing without an active report"""
+    if _active_report is not None:
+        _active_report.record_status(kb_id, status, error)
+
+
+def record_memory_budget(budget_bytes: int, exceeded: bool):
+    """Records the memory budget of the run, does nothing without an active report"""
+    if _active_report is not None:
+        _active_report.record_memory_budget(budget_bytes, exceeded)
+
+
+@contextmanager
+def stage(stage_name: str):
+    """Times (and profiles) a stage with the active report, does nothing without one"""
+    if _active_report is None:
+        yield
+        return
+    with _active_report.stage(stage_name):
+        yield
+
+
+def timed_iter(iterable, stage_name: str):
+    """Adds the time spent waiting for the items of an iterable to a stage of the active report"""
+    if _active_report is None:
+        return iter(iterable)
+    return _active_report.timed_iter(iterable, stage_name)
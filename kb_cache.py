@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+""" kb_cache.py: Provides resolution table from VMware KBs as machine-readable json files.
+VMware KBs provide release information only as a human-readable HTML table.
+However, for automation it would be nice to have it in a machine-readable format.
+This script takes the tables from a VMware KB page and provides a json-file as an output.
+
+This program is free software: you can redistribute it and/or modify it under
+the terms of the GNU General Public License as published by the Free Software
+Foundation, either version 3 of the License, or (at your option) any later
+version.
+This program is distributed in the hope that it will be useful, but WITHOUT
+ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+You should have received a copy of the GNU General Public License along with
+this program. If not, see <http://www.gnu.org/licenses/>.
+"""
+
+__author__ = "Dominik Zorgnotti"
+__contact__ = "dominik@why-did-it.fail"
+__created__ = "2026-10-17"
+__deprecated__ = False
+__contact__ = "dominik@why-did-it.fail"
+__license__ = "GPLv3"
+__status__ = "beta"
+__version__ = "0.1.0"
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+# The relative directory holding the cached KB articles
+DEFAULT_CACHE_DIR = ".kb_cache"
+# Cached articles younger than this (in seconds) are used without asking the KB API
+DEFAULT_CACHE_TTL = 12 * 60 * 60
+# Upper bound for the size of all cached articles, the least recently used are evicted first
+DEFAULT_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+INDEX_FILENAME = "index.json"
+OBJECTS_DIRNAME = "objects"
+
+
+class KbCache:
+    """Content-addressed on-disk cache of the raw KB article JSON, keyed by KB id.
+    The index maps a KB id to the SHA-256 of its payload plus the HTTP validators (ETag, Last-Modified)."""
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, ttl: float = DEFAULT_CACHE_TTL,
+                 max_bytes: int = DEFAULT_CACHE_MAX_BYTES, offline: bool = False):
+        self.cache_dir = cache_dir
+        self.objects_dir = os.path.join(cache_dir, OBJECTS_DIRNAME)
+        self.index_file = os.path.join(cache_dir, INDEX_FILENAME)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.offline = offline
+        # The fetch stage runs in threads, guard the index
+        self._lock = threading.Lock()
+        if not os.path.exists(self.objects_dir):
+            os.makedirs(self.objects_dir)
+        self.index = self.load_index()
+
+    def load_index(self):
+        """Reads the cache index from disk, an unreadable index is treated as an empty cache"""
+        if not os.path.exists(self.index_file):
+            return {}
+        try:
+            with open(self.index_file, "r", encoding="utf-8") as index_fh:
+                return json.load(index_fh)
+        except (OSError, ValueError) as err:
+            logging.warning(f"Ignoring unreadable cache index {self.index_file}: {err}")
+            return {}
+
+    def save(self):
+        """Evicts entries above the size limit and atomically writes the index to disk"""
+        with self._lock:
+            self.evict()
+            temp_file = f"{self.index_file}.tmp"
+            with open(temp_file, "w", encoding="utf-8") as index_fh:
+                json.dump(self.index, index_fh, indent=4, sort_keys=True)
+            os.replace(temp_file, self.index_file)
+
+    def object_path(self, digest: str):
+        """Returns the path of the payload file for a SHA-256 digest"""
+        return os.path.join(self.objects_dir, f"{digest}.json")
+
+    def lookup(self, kb_id):
+        """Returns the index entry for a KB id if its payload is still on disk, otherwise None"""
+        with self._lock:
+            entry = self.index.get(str(kb_id))
+        if entry is None or not os.path.exists(self.object_path(entry["sha256"])):
+            return None
+        return entry
+
+    def is_fresh(self, entry):
+        """True if the entry was fetched or revalidated within the TTL"""
+        return (time.time() - entry["validated_at"]) < self.ttl
+
+    def revalidation_headers(self, entry):
+        """Returns the conditional request headers for a cached entry"""
+        headers = {}
+        if entry is None:
+            return headers
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def load(self, kb_id):
+        """Returns the cached article for a KB id as parsed JSON"""
+        entry = self.lookup(kb_id)
+        if entry is None:
+            raise LookupError(f"KB {kb_id} is not in the cache {self.cache_dir}")
+        with open(self.object_path(entry["sha256"]), "rb") as object_fh:
+            article = json.loads(object_fh.read())
+        with self._lock:
+            entry["accessed_at"] = time.time()
+        return article
+
+    def store(self, kb_id, payload: bytes, etag=None, last_modified=None):
+        """Writes the raw article payload to the cache and records it in the index"""
+        digest = hashlib.sha256(payload).hexdigest()
+        object_file = self.object_path(digest)
+        # Same content, same file - nothing to write if it is already there
+        if not os.path.exists(object_file):
+            temp_file = f"{object_file}.{threading.get_ident()}.tmp"
+            with open(temp_file, "wb") as object_fh:
+                object_fh.write(payload)
+            os.replace(temp_file, object_file)
+        now = time.time()
+        with self._lock:
+            self.index[str(kb_id)] = {
+                "sha256": digest,
+                "size": len(payload),
+                "etag": etag,
+                "last_modified": last_modified,
+                "fetched_at": now,
+                "validated_at": now,
+                "accessed_at": now,
+            }
+
+    def mark_validated(self, kb_id):
+        """Records a successful revalidation (HTTP 304) for a KB id"""
+        with self._lock:
+            entry = self.index.get(str(kb_id))
+            if entry is not None:
+                entry["validated_at"] = time.time()
+
+    def evict(self):
+        """Drops the least recently used entries until the cache fits into max_bytes and removes orphaned payloads.
+        Expects the caller to hold the lock."""
+        referenced = {}
+        for entry in self.index.values():
+            referenced[entry["sha256"]] = entry["size"]
+        total_size = sum(referenced.values())
+        for kb_id, entry in sorted(self.index.items(), key=lambda item: item[1]["accessed_at"]):
+            if total_size <= self.max_bytes:
+                break
+            del self.index[kb_id]
+            # Payloads are shared between KB ids with identical content
+            if not any(other["sha256"] == entry["sha256"] for other in self.index.values()):
+                total_size -= referenced.pop(entry["sha256"])
+        for filename in os.listdir(self.objects_dir):
+            digest, extension = os.path.splitext(filename)
+            if extension == ".json" and digest not in referenced:
+                os.remove(os.path.join(self.objects_dir, filename))
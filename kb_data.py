@@ -24,37 +24,118 @@ __license__ = "GPLv3"
 __status__ = "beta"
 __version__ = "0.4.0"
 
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import cached_property
+
 import pandas as pd
 
 from data_handling import standardize_columns
+from date_parsing import parse_dates
+from table_extraction import extract_tables, promote_header_rows
 from webparsing import get_kb_webdata
 
 # YOLO as I am okay with overwriting DF data regardless of the results
 pd.options.mode.chained_assignment = None  # default='warn'
 
 
+def get_resolution_html(raw_html_article):
+    """Extracts the resolution section from the content section of a fetched KB article"""
+    # Get the Section within the webpage that holds the desired data (make it a bit more targeted)
+    if "Resolution" in raw_html_article["content"][1]:
+        resolution = raw_html_article["content"][1]["Resolution"]
+    elif "Resolution" in raw_html_article["content"][0]:
+        resolution = raw_html_article["content"][0]["Resolution"]
+    else:
+        raise ValueError("No resolution section in this page!")
+    return resolution
+
+
 class KbData:
+    """A KB article with its release tables. Every stage (fetch, metadata, resolution section, table extraction and
+    transformation) runs lazily on first access and only once, so e.g. the product can be checked without parsing."""
 
-    def __init__(self, kb_id):
+    def __init__(self, kb_id, raw_html_article=None, known_date_formats=None):
         self.id = kb_id
-        self.raw_html_article = get_kb_webdata(kb_id)
-        self.title = self.get_title()
-        self.product = self.get_first_product_name()
-        self.fmt_product = self.format_product_name()
-        self.raw_html_resolution = self.get_resolution_section()
-        self.list_of_dframes = self.parse_releasedata()
-        self.list_of_merged_frames = None
+        # The article may have been fetched already (e.g. by the concurrent fetch stage)
+        if raw_html_article is not None:
+            self.__dict__["raw_html_article"] = raw_html_article
+        # Date formats of the release date columns, known from previous runs and detected in this one
+        self.known_date_formats = dict(known_date_formats or {})
+        self.date_formats = {}
+        self.unparsed_dates = {}
+
+    @cached_property
+    def raw_html_article(self):
+        """The KB article as returned by the KB API, fetched if it was not passed in"""
+        return get_kb_webdata(self.id)
+
+    @cached_property
+    def title(self):
+        """The title of the KB article"""
+        return self.get_title()
+
+    @cached_property
+    def product(self):
+        """The product the KB article is about"""
+        return self.get_first_product_name()
+
+    @cached_property
+    def fmt_product(self):
+        """The product name for file names"""
+        return self.format_product_name()
+
+    @cached_property
+    def raw_html_resolution(self):
+        """The HTML of the resolution section holding the release tables"""
+        return self.get_resolution_section()
+
+    @cached_property
+    def raw_tables(self):
+        """The HTML tables of the resolution section as untransformed dataframes"""
+        return self.extract_tables()
+
+    @cached_property
+    def list_of_dframes(self):
+        """The transformed release tables of the KB"""
+        return self.parse_releasedata()
+
+    @cached_property
+    def list_of_merged_frames(self):
+        """A dict of tables merged from the release tables, if the KB provides any"""
+        return self.merge_tables()
+
+    def release(self, tables: bool = True):
+        """Drops the article, its resolution section and the untransformed tables, with tables=True also the release
+        tables, e.g. once the outputs of the KB are written. Released data is fetched or parsed again on access."""
+        released = ["raw_html_article", "raw_html_resolution", "raw_tables"]
+        if tables:
+            released += ["list_of_dframes", "list_of_merged_frames"]
+        for attribute in released:
+            self.__dict__.pop(attribute, None)
+
+    def extract_tables(self):
+        """Extracts all tables from the resolution section in a single lxml pass."""
+        return extract_tables(self.raw_html_resolution)
+
+    def merge_tables(self):
+        """No merged tables by default, KBs spreading releases over several tables override this"""
+        return None
+
+    def parse_release_dates(self, column, column_key: str):
+        """Parses a release date column, remembers its format and the values that are no date"""
+        parsed_column, date_format, unparsed_values = parse_dates(column, self.known_date_formats.get(column_key))
+        if date_format is not None:
+            self.date_formats[column_key] = date_format
+        if unparsed_values:
+            self.unparsed_dates[column_key] = unparsed_values
+        return parsed_column
 
     def get_resolution_section(self):
         """Extracts the resolution section from the KB article content section"""
-        # Get the Section within the webpage that holds the desired data (make it a bit more targeted)
-        if "Resolution" in self.raw_html_article["content"][1]:
-            resolution = self.raw_html_article["content"][1]["Resolution"]
-        elif "Resolution" in self.raw_html_article["content"][0]:
-            resolution = self.raw_html_article["content"][0]["Resolution"]
-        else:
-            raise ValueError("No resolution section in this page!")
-        return resolution
+        return get_resolution_html(self.raw_html_article)
 
     def get_first_product_name(self):
         """Extracts the first product mentioned in the KB articles meta data"""
@@ -71,26 +152,22 @@ class KbData:
         return self.raw_html_article["meta"]["articleInfo"]["title"]
 
     def parse_releasedata(self):
-        """Accepts the html data for product releases from the KB article for parsing with pandas."""
-        df = pd.read_html(self.raw_html_resolution, flavor="bs4")
+        """Transforms the tables extracted from the KB article into standardized release dataframes."""
+        df = self.raw_tables
         # Contains a list of all tables converted to dataframes in the resolution section
         list_of_release_df = []
         dict_of_releases = {}
         for table_id in range(len(df)):
             # Since some HTML table have no header, we need to reassign the first row as heading
             if "Version" not in df[table_id].columns:
-                df_header = df[table_id][:1]
-                current_df = df[table_id][1:]
-                current_df.columns = df_header.values.tolist()[0]
-                # Moving the del up here
-                del df_header
+                current_df = promote_header_rows(df[table_id])
             else:
                 current_df = df[table_id]
             releaseinfo_dataframe = standardize_columns(current_df)
             # Get the data types right, especially the date format='%m/%d/%Y'
             if "Release Date" in current_df.columns:
-                releaseinfo_dataframe["Release Date"] = pd.to_datetime(current_df["Release Date"],
-                                                                       infer_datetime_format=True, errors='coerce')
+                releaseinfo_dataframe["Release Date"] = self.parse_release_dates(current_df["Release Date"],
+                                                                                 f"table{table_id}/Release Date")
             list_of_release_df.append(releaseinfo_dataframe)
             # Fun stuff may happen with dataframes if not erased before the next iteration
             del current_df, releaseinfo_dataframe
@@ -101,14 +178,13 @@ class KbData:
 
 # vCenter releases
 class Kb2143838(KbData):
-    def __init__(self, kb_id):
-        super().__init__(kb_id)
-        self.list_of_dframes = self.parse_releasedata()
-        self.list_of_merged_frames = self.merge_tables_kb2143838()
+    def merge_tables(self):
+        """vCenter releases are spread over several tables, merge them by edition"""
+        return self.merge_tables_kb2143838()
 
     def parse_releasedata(self):
-        """Accepts the html data for product releases from the KB article for parsing with pandas."""
-        df = pd.read_html(self.raw_html_resolution, flavor="bs4")
+        """Transforms the tables extracted from the KB article into standardized release dataframes."""
+        df = self.raw_tables
         # Contains a list of all tables converted to dataframes in the resolution section
         list_of_release_df = []
         for table_id in range(len(df)):
@@ -117,9 +193,8 @@ class Kb2143838(KbData):
                 vcenter7_table = df[table_id]
                 reformatted_df = self.transform_kb2143838(vcenter7_table)
                 reformatted_df["Edition"] = "VCSA"
-                reformatted_df["Release Date"] = pd.to_datetime(reformatted_df["Release Date"],
-                                                                infer_datetime_format=True,
-                                                                errors='coerce')
+                reformatted_df["Release Date"] = self.parse_release_dates(reformatted_df["Release Date"],
+                                                                          f"table{table_id}/Release Date")
                 list_of_release_df.append(reformatted_df)
             # VCSA/Windows 6.7
             elif table_id == 1:
@@ -128,25 +203,22 @@ class Kb2143838(KbData):
                 for product_edition in product_editions:
                     split_df = self.split_kb2143838(vcenter67_table, product_edition)
                     reformatted_df = self.transform_kb2143838(split_df)
-                    reformatted_df["Release Date"] = pd.to_datetime(reformatted_df["Release Date"],
-                                                                    infer_datetime_format=True,
-                                                                    errors='coerce')
+                    reformatted_df["Release Date"] = self.parse_release_dates(
+                        reformatted_df["Release Date"], f"table{table_id}/{product_edition}/Release Date")
                     list_of_release_df.append(reformatted_df)
                     del split_df
             # VCSA/Windows less equal 6.5
             elif table_id == 2:
                 # The HTML table have no header, we need to reassign the first row as heading
-                df_header = df[table_id][:1]
-                vcenter_le65_table = df[table_id][1:]
-                vcenter_le65_table.columns = df_header.values.tolist()[0]
+                vcenter_le65_table = promote_header_rows(df[table_id])
                 # Get the data types right, especially the date format='%m/%d/%Y'
-                vcenter_le65_table["Release Date"] = pd.to_datetime(vcenter_le65_table["Release Date"],
-                                                                    infer_datetime_format=True,
-                                                                    errors='coerce')
+                vcenter_le65_table["Release Date"] = self.parse_release_dates(vcenter_le65_table["Release Date"],
+                                                                              f"table{table_id}/Release Date")
                 # Filter VCSA releases by keyword "Appliance", for Windows negate the search
-                vcsa_le65 = vcenter_le65_table[vcenter_le65_table["Version"].str.contains("appliance", case=False)]
+                is_appliance = vcenter_le65_table["Version"].str.contains("appliance", case=False)
+                vcsa_le65 = vcenter_le65_table[is_appliance]
                 vcsa_le65["Edition"] = "VCSA"
-                winvc_le65 = vcenter_le65_table[~vcenter_le65_table["Version"].str.contains("appliance", case=False)]
+                winvc_le65 = vcenter_le65_table[~is_appliance]
                 winvc_le65["Edition"] = "Windows"
                 list_of_release_df.append(vcsa_le65)
                 list_of_release_df.append(winvc_le65)
@@ -156,10 +228,9 @@ class Kb2143838(KbData):
 
     def split_kb2143838(self, dataframe, product_edition):
         """Splits a dataframe based on the product edition (VCSA, Windows) and returns the output dataframe"""
+        # Each edition has its own header row within the table
         tempdf_headless = dataframe[dataframe[0] == product_edition]
-        tempdf_header = tempdf_headless[:1]
-        tempdf = tempdf_headless[1:]
-        tempdf.columns = tempdf_header.values.tolist()[0]
+        tempdf = promote_header_rows(tempdf_headless)
         tempdf.rename(columns={product_edition: "Edition"}, inplace=True)
         return tempdf
 
@@ -171,13 +242,15 @@ class Kb2143838(KbData):
         if "Version" in dataframe.columns:
             # Normalize unicode with none breaking space in some rows
             dataframe["Version"] = dataframe["Version"].str.normalize("NFKD")
-            tempdf = dataframe.rename(columns={"Version": "Version - Release Name"})
-            tempdf[["Version", "Release Name"]] = tempdf["Version - Release Name"].str.split(pat=r"(", expand=True)
+            # The table is transformed in place, it is a fresh slice of the extracted table
+            dataframe.rename(columns={"Version": "Version - Release Name"}, inplace=True)
+            version_parts = dataframe["Version - Release Name"].str.split(pat=r"(", expand=True)
+            dataframe["Version"] = version_parts[0].str.strip()
             # Remove ) and trailing space
-            tempdf["Release Name"] = tempdf["Release Name"].str.strip(r")")
-            tempdf["Version"] = tempdf["Version"].str.strip()
+            dataframe["Release Name"] = version_parts[1].str.strip(r")")
+            del version_parts
 
-        return tempdf
+        return dataframe
 
     def merge_tables_kb2143838(self):
         """Accepts a list of dataframes, merge them and return a list of the merged df"""
@@ -189,47 +262,31 @@ class Kb2143838(KbData):
         vc67_win = self.list_of_dframes[2]
         vc65le_vcsa = self.list_of_dframes[3]
         vc65le_win = self.list_of_dframes[4]
-        # Solved by WET
-        # Merge VCSA tables
-        merged_vcsa_builds = vc7x_vcsa.append(vc67_vcsa)
-        merged_vcsa_builds = merged_vcsa_builds.append(vc65le_vcsa)
-        merged_vcsa_builds.reset_index(drop=True, inplace=True)
-        merged_vcenter_tables["vcsa_builds"] = merged_vcsa_builds
-        # Merge vCenter for Windows tables
-        merged_windows_builds = vc67_win.append(vc65le_win)
-        merged_windows_builds.reset_index(drop=True, inplace=True)
-        merged_vcenter_tables["windows_vc_builds"] = merged_windows_builds
-        # Merge both tables
-        merged_vc_all_builds = merged_vcsa_builds.append(merged_windows_builds)
-        merged_vc_all_builds.reset_index(drop=True, inplace=True)
-        merged_vcenter_tables["all_vcenter_builds"] = merged_vc_all_builds
+        # Every merged table is built with a single concat, each DataFrame.append call copied the whole frame
+        vcsa_tables = [vc7x_vcsa, vc67_vcsa, vc65le_vcsa]
+        windows_tables = [vc67_win, vc65le_win]
+        merged_vcenter_tables["vcsa_builds"] = pd.concat(vcsa_tables, ignore_index=True)
+        merged_vcenter_tables["windows_vc_builds"] = pd.concat(windows_tables, ignore_index=True)
+        merged_vcenter_tables["all_vcenter_builds"] = pd.concat(vcsa_tables + windows_tables, ignore_index=True)
         # Return the list
         return merged_vcenter_tables
 
 
 # vRA releases
 class Kb2143850(KbData):
-    def __init__(self, kb_id):
-        super().__init__(kb_id)
-        self.list_of_dframes = self.parse_releasedata()
-
     def parse_releasedata(self):
-        """Accepts the html data for product releases from the KB article for parsing with pandas."""
-        df = pd.read_html(self.raw_html_resolution, flavor="bs4")
+        """Transforms the tables extracted from the KB article into standardized release dataframes."""
+        df = self.raw_tables
         # Contains a list of all tables converted to dataframes in the resolution section
         list_of_release_df = []
         for table_id in range(len(df)):
             if table_id == 0:
                 # The HTML table have no header, we need to reassign the first row as heading
-                df_header = df[table_id][:1]
-                current_df = df[table_id][1:]
-                current_df.columns = df_header.values.tolist()[0]
-                # Moving the del up here
-                del df_header
+                current_df = promote_header_rows(df[table_id])
                 current_df = self.transform_kb2143850(current_df)
                 # Get the data types right, especially the date format='%m/%d/%Y'
-                current_df["Release Date"] = pd.to_datetime(current_df["Release Date"], infer_datetime_format=True,
-                                                            errors='coerce')
+                current_df["Release Date"] = self.parse_release_dates(current_df["Release Date"],
+                                                                      f"table{table_id}/Release Date")
                 list_of_release_df.append(current_df)
             else:
                 print("Unknown table added, please add handling")
@@ -245,45 +302,94 @@ class Kb2143850(KbData):
 
 # vxrail releases
 class Kb52075(KbData):
-    def __init__(self, kb_id):
-        super().__init__(kb_id)
-        self.list_of_dframes = self.parse_releasedata()
-
     def get_first_product_name(self):
         """Overriding function with hardcoded value as it isn't in the meta section"""
         return "Dell VxRAIL"
 
     def parse_releasedata(self):
-        """Accepts the html data for product releases from the KB article for parsing with pandas."""
-        df = pd.read_html(self.raw_html_resolution, flavor="bs4")
+        """Transforms the tables extracted from the KB article into standardized release dataframes."""
+        df = self.raw_tables
         # Contains a list of all tables converted to dataframes in the resolution section
         list_of_release_df = []
         for table_id in range(len(df)):
             if table_id == 0:
-                # The HTML table have no header, we need to reassign the first row as heading
-                df_header = df[table_id][:1]
-                # The header has more than one column header, let's merge. I am not even attempting to automate this.
-                df_header.at[0, 6] = "External vCSA - Min"
-                df_header.at[0, 7] = "External vCSA - Recommended"
-                df_header.at[0, 8] = "External vCSA - Max"
-                current_df = df[table_id][2:]
-                current_df.columns = df_header.values.tolist()[0]
-                # Moving the del up here
-                del df_header
+                # The HTML table have no header, the first two rows are the heading.
+                # Sub-headers are merged with their parent, e.g. "External vCSA - Min"
+                current_df = promote_header_rows(df[table_id], header_rows=2)
                 # Normalize unicode with none breaking space in some rows
                 current_df["Esxi (Version - Build #)"] = current_df["Esxi (Version - Build #)"].str.normalize("NFKD")
-                # Atomize multi-value columns
-                current_df[["ESXi version", "ESXi build number"]] = current_df["Esxi (Version - Build #)"].str.split(
-                    pat=r"-", expand=True)
-                current_df["ESXi version"] = current_df["ESXi version"].str.strip()
-                current_df["ESXi build number"] = current_df["ESXi build number"].str.strip()
-                current_df[["VxRail manager version", "VxRail manager build number"]] = current_df[
-                    "VxRail manager"].str.split(
-                    pat=r"-", expand=True)
-                current_df["VxRail manager build number"] = current_df["VxRail manager build number"].str.strip()
-                current_df["VxRail manager version"] = current_df["VxRail manager version"].str.strip()
+                # Atomize multi-value columns, each part is stripped on its way into the table
+                esxi_parts = current_df["Esxi (Version - Build #)"].str.split(pat=r"-", expand=True)
+                current_df["ESXi version"] = esxi_parts[0].str.strip()
+                current_df["ESXi build number"] = esxi_parts[1].str.strip()
+                vxrail_manager_parts = current_df["VxRail manager"].str.split(pat=r"-", expand=True)
+                current_df["VxRail manager version"] = vxrail_manager_parts[0].str.strip()
+                current_df["VxRail manager build number"] = vxrail_manager_parts[1].str.strip()
+                del esxi_parts, vxrail_manager_parts
                 current_df.reset_index(drop=True, inplace=True)
                 list_of_release_df.append(current_df)
             else:
                 print("Unknown table added, please add handling")
         return list_of_release_df
+
+
+# Handle specific KBs by using extra Classes.
+# KB2143838: vCenter
+# KB2143850: vRA
+# KB52075: vxrail
+KB_CLASSES = {
+    2143838: Kb2143838,
+    2143850: Kb2143850,
+    52075: Kb52075,
+}
+
+
+def create_kb_object(kb_id, raw_html_article=None, known_date_formats=None):
+    """Returns the matching KB object for the KB id, optionally built from an already fetched article"""
+    kb_class = KB_CLASSES.get(kb_id, KbData)
+    return kb_class(kb_id, raw_html_article, known_date_formats)
+
+
+def matches_product(product: str, product_patterns):
+    """True if the product name contains one of the patterns, ignoring case"""
+    return any(product_pattern.lower() in product.lower() for product_pattern in product_patterns)
+
+
+def parse_kb_object(kb_id, raw_html_article, known_date_formats=None):
+    """Builds the KB object from a fetched article and runs all parsing stages.
+    Meant to run in a worker process, errors are returned instead of raised so one KB cannot break the others.
+    Returns a tuple of (kb id, KB object or None, error message or None).
+    The KB object carries the time spent on parsing in parse_seconds."""
+    start = time.perf_counter()
+    try:
+        kb_object = create_kb_object(kb_id, raw_html_article, known_date_formats)
+        # Reading the cached properties parses them here, in the worker, the parent process only gets the results
+        _ = kb_object.title, kb_object.fmt_product, kb_object.list_of_dframes, kb_object.list_of_merged_frames
+    except Exception as err:
+        return kb_id, None, f"{type(err).__name__}: {err}"
+    kb_object.parse_seconds = time.perf_counter() - start
+    # The article and untransformed tables are not needed anymore, don't send them back to the parent process
+    kb_object.release(tables=False)
+    return kb_id, kb_object, None
+
+
+def parse_kb_articles(fetched_articles, jobs: int = 1, date_formats=None):
+    """Accepts (kb id, article) tuples and parses them, with more than one job in a process pool.
+    The articles are consumed lazily, with a process pool only a few articles per job are queued at a time.
+    date_formats optionally maps KB ids to the date formats known from previous runs.
+    Yields (kb id, KB object or None, error message or None) in the order of the input."""
+    date_formats = date_formats or {}
+    if jobs == 0:
+        jobs = os.cpu_count() or 1
+    if jobs <= 1:
+        for kb_id, raw_html_article in fetched_articles:
+            yield parse_kb_object(kb_id, raw_html_article, date_formats.get(kb_id))
+        return
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        pending = deque()
+        for kb_id, raw_html_article in fetched_articles:
+            pending.append(executor.submit(parse_kb_object, kb_id, raw_html_article, date_formats.get(kb_id)))
+            if len(pending) >= 2 * jobs:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
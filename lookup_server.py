@@ -0,0 +1,324 @@
+#!/usr/bin/env python
+""" lookup_server.py: Provides resolution table from VMware KBs as machine-readable json files.
+VMware KBs provide release information only as a human-readable HTML table.
+However, for automation it would be nice to have it in a machine-readable format.
+This script takes the tables from a VMware KB page and provides a json-file as an output.
+
+This program is free software: you can redistribute it and/or modify it under
+the terms of the GNU General Public License as published by the Free Software
+Foundation, either version 3 of the License, or (at your option) any later
+version.
+This program is distributed in the hope that it will be useful, but WITHOUT
+ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+You should have received a copy of the GNU General Public License along with
+this program. If not, see <http://www.gnu.org/licenses/>.
+"""
+
+__author__ = "Dominik Zorgnotti"
+__contact__ = "dominik@why-did-it.fail"
+__created__ = "2026-10-17"
+__deprecated__ = False
+__contact__ = "dominik@why-did-it.fail"
+__license__ = "GPLv3"
+__status__ = "beta"
+__version__ = "0.1.0"
+
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+import instrumentation
+from build_index import BUILD_INDEX_FILENAME, COLUMNS, kb_build_rows, normalize_build_number, read_index_rows
+from publisher import file_sha256
+
+DEFAULT_PORT = 8080
+# Seconds clients and proxies may cache a lookup, the ETag changes with every new index
+DEFAULT_MAX_AGE = 300
+# Seconds between the checks for a new index file
+DEFAULT_RELOAD_INTERVAL = 5.0
+# Limits of a batch lookup
+MAX_BATCH_BUILDS = 10000
+MAX_BODY_BYTES = 1024 * 1024
+
+
+def normalize_key(value):
+    """Returns a version or product name as lookup key, stripped and lower-case"""
+    if value is None:
+        return None
+    return str(value).strip().lower() or None
+
+
+class LookupIndex:
+    """In-memory indexes of the build index rows by build number, version and product.
+    An index is never changed once built, a reload builds a new one. The JSON of the matches of every build number is
+    serialized up front, so lookups only join the prepared strings."""
+
+    def __init__(self, rows, etag: str):
+        self.etag = etag
+        self.loaded_at = time.time()
+        self.by_build = {}
+        self.by_version = {}
+        self.by_product = {}
+        for row in rows:
+            entry = dict(zip(COLUMNS, row))
+            self.by_build.setdefault(entry["build"], []).append(entry)
+            if entry["version"] is not None:
+                self.by_version.setdefault(normalize_key(entry["version"]), []).append(entry)
+            if entry["product"] is not None:
+                self.by_product.setdefault(normalize_key(entry["product"]), []).append(entry)
+        self.build_matches = {build: json.dumps(matches) for build, matches in self.by_build.items()}
+        self.build_responses = {build: f'{{"build": {json.dumps(build)}, "matches": {matches}}}'.encode("utf-8")
+                                for build, matches in self.build_matches.items()}
+
+    @classmethod
+    def from_index_file(cls, index_file: str):
+        """Loads all rows of a build index file, its SHA-256 is the ETag"""
+        rows = read_index_rows(index_file)
+        return cls(rows, file_sha256(index_file))
+
+    @classmethod
+    def from_kb_objects(cls, kb_dataobjects):
+        """Builds the index from parsed KB objects instead of the pipeline's outputs"""
+        rows = [row for kb_dataobject in kb_dataobjects for row in kb_build_rows(kb_dataobject)]
+        etag = hashlib.sha256(json.dumps(rows).encode("utf-8")).hexdigest()
+        return cls(rows, etag)
+
+    def lookup_builds(self, builds):
+        """Returns a dict of build number (as given) and its index entries, unknown builds have none"""
+        return {build: self.by_build.get(normalize_build_number(build), []) for build in builds}
+
+    def lookup_builds_json(self, builds):
+        """Returns the JSON of lookup_builds(), joined from the prepared JSON of every build number"""
+        matches = ", ".join(f"{json.dumps(build)}: {self.build_matches.get(normalize_build_number(build), '[]')}"
+                            for build in builds)
+        return f'{{"matches": {{{matches}}}}}'.encode("utf-8")
+
+    def lookup_version(self, version: str, product=None):
+        """Returns the index entries of a version, optionally of products whose name contains the given string"""
+        entries = self.by_version.get(normalize_key(version), [])
+        product = normalize_key(product)
+        if product is None:
+            return entries
+        return [entry for entry in entries if product in normalize_key(entry["product"] or "")]
+
+    def lookup_product(self, product: str):
+        """Returns all index entries of a product, by its full name ignoring case"""
+        return self.by_product.get(normalize_key(product), [])
+
+    def summary(self):
+        """Returns the ETag, load time and size of the index"""
+        return {"etag": self.etag, "loaded_at": self.loaded_at, "builds": len(self.by_build),
+                "versions": len(self.by_version), "products": len(self.by_product)}
+
+
+class LookupServer(ThreadingHTTPServer):
+    """Serves lookups from the current index. Replacing the index is a single reference assignment, requests in
+    flight finish with the index they started with."""
+    daemon_threads = True
+
+    def __init__(self, server_address, index: LookupIndex, max_age: int = DEFAULT_MAX_AGE):
+        super().__init__(server_address, LookupRequestHandler)
+        self.index = index
+        self.max_age = max_age
+
+
+class LookupRequestHandler(BaseHTTPRequestHandler):
+    """Answers the lookup requests with JSON:
+    GET /build/<build>, GET /builds?build=<build>&build=..., POST /builds with a JSON list of builds,
+    GET /version/<version>?product=<name>, GET /product/<name>, GET /products and GET /health"""
+    # Keep-alive connections, every response has a Content-Length
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately, Nagle's algorithm would hold the body back for a delayed ACK
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        index = self.server.index
+        url = urlparse(self.path)
+        parts = [unquote(part) for part in url.path.strip("/").split("/")]
+        query = parse_qs(url.query)
+        if parts == ["health"]:
+            self.send_json(200, json.dumps({"status": "ok", **index.summary()}).encode("utf-8"), cacheable=False)
+            return
+        if len(parts) == 2 and parts[0] == "build":
+            build = normalize_build_number(parts[1])
+            body = index.build_responses.get(build)
+            if body is None:
+                self.send_json(404, json.dumps({"build": parts[1], "matches": []}).encode("utf-8"), index)
+            else:
+                self.send_json(200, body, index)
+        elif parts == ["builds"]:
+            self.send_batch(index, query.get("build", []))
+        elif len(parts) == 2 and parts[0] == "version":
+            product = query.get("product", [None])[0]
+            matches = index.lookup_version(parts[1], product)
+            self.send_json(200 if matches else 404,
+                           json.dumps({"version": parts[1], "product": product, "matches": matches}).encode("utf-8"),
+                           index)
+        elif len(parts) == 2 and parts[0] == "product":
+            matches = index.lookup_product(parts[1])
+            self.send_json(200 if matches else 404,
+                           json.dumps({"product": parts[1], "matches": matches}).encode("utf-8"), index)
+        elif parts == ["products"]:
+            products = {entries[0]["product"]: len(entries) for entries in index.by_product.values()}
+            self.send_json(200, json.dumps({"products": products}).encode("utf-8"), index)
+        else:
+            self.send_error_json(404, f"Unknown path {url.path}")
+
+    def do_POST(self):
+        index = self.server.index
+        if urlparse(self.path).path.strip("/") != "builds":
+            self.reject_body(404, f"Unknown path {self.path}")
+            return
+        try:
+            content_length = int(self.headers.get("Content-Length", 0))
+        except ValueError:
+            content_length = -1
+        # A negative length would read until the client closes the connection, which blocks this handler.
+        # A chunked body has no Content-Length and is not supported.
+        if content_length < 0 or "Transfer-Encoding" in self.headers:
+            self.reject_body(400, "Invalid Content-Length")
+            return
+        if content_length > MAX_BODY_BYTES:
+            self.reject_body(413, f"Request body is larger than {MAX_BODY_BYTES} bytes")
+            return
+        try:
+            request = json.loads(self.rfile.read(content_length) or b"null")
+        except ValueError as err:
+            self.send_error_json(400, f"Request body is no JSON: {err}")
+            return
+        builds = request.get("builds") if isinstance(request, dict) else request
+        if not isinstance(builds, list):
+            self.send_error_json(400, 'Expected a JSON list of build numbers or {"builds": [...]}')
+            return
+        self.send_batch(index, builds)
+
+    def reject_body(self, status: int, message: str):
+        """Sends an error for a request whose body is not read. The unread body cannot be told apart from the next
+        request, so the connection is closed after the response."""
+        self.close_connection = True
+        self.send_error_json(status, message)
+
+    def send_batch(self, index: LookupIndex, builds):
+        """Sends the matches of several build numbers as one JSON object"""
+        if len(builds) > MAX_BATCH_BUILDS:
+            self.send_error_json(413, f"At most {MAX_BATCH_BUILDS} build numbers per request")
+            return
+        self.send_json(200, index.lookup_builds_json(str(build) for build in builds), index)
+
+    def send_json(self, status: int, body: bytes, index=None, cacheable: bool = True):
+        """Sends a JSON response, cacheable responses carry the ETag of the index they were served from.
+        A client that already has the response of this index gets a 304 without body."""
+        if status == 200 and cacheable and index is not None and self.headers.get("If-None-Match") == f'"{index.etag}"':
+            status, body = 304, b""
+        self.send_response(status)
+        if status != 304:
+            self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if cacheable and index is not None:
+            self.send_header("ETag", f'"{index.etag}"')
+            self.send_header("Cache-Control", f"public, max-age={self.server.max_age}")
+        else:
+            self.send_header("Cache-Control", "no-store")
+        if self.close_connection:
+            self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_error_json(self, status: int, message: str):
+        """Sends an error as JSON"""
+        self.send_json(status, json.dumps({"error": message}).encode("utf-8"), cacheable=False)
+
+    def log_message(self, format, *args):
+        logging.debug(f"{self.address_string()} {format % args}")
+
+
+class IndexReloader(threading.Thread):
+    """Checks the index file for a new version and swaps the server's index when a run published one.
+    A file that cannot be loaded is logged and the current index is kept."""
+
+    def __init__(self, server: LookupServer, index_file: str, interval: float = DEFAULT_RELOAD_INTERVAL):
+        super().__init__(name="index-reloader", daemon=True)
+        self.server = server
+        self.index_file = index_file
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.file_signature = self.current_signature()
+
+    def current_signature(self):
+        """Returns what identifies a version of the index file, the publisher replaces it with a new file"""
+        try:
+            file_stat = os.stat(self.index_file)
+        except OSError:
+            return None
+        return file_stat.st_ino, file_stat.st_mtime_ns, file_stat.st_size
+
+    def reload_if_changed(self):
+        """Loads the index file if it changed since the last check, returns True if a new index is served"""
+        file_signature = self.current_signature()
+        if file_signature is None or file_signature == self.file_signature:
+            return False
+        try:
+            index = LookupIndex.from_index_file(self.index_file)
+        except (OSError, sqlite3.Error) as err:
+            logging.error(f"Cannot reload {self.index_file}, still serving the previous index: {err}")
+            return False
+        self.file_signature = file_signature
+        if index.etag == self.server.index.etag:
+            return False
+        self.server.index = index
+        logging.info(f"Reloaded {self.index_file}: {len(index.by_build)} build numbers")
+        return True
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.reload_if_changed()
+
+    def stop(self):
+        """Ends the checks after the current one"""
+        self.stopped.set()
+
+
+def parse_arguments():
+    """Returns the parsed command line arguments"""
+    parser = argparse.ArgumentParser(description="Serve build number lookups from the build index over HTTP")
+    parser.add_argument("--index", default=os.path.join("outputs", BUILD_INDEX_FILENAME),
+                        help=f"Path of the build index (default: outputs/{BUILD_INDEX_FILENAME})")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"Port to listen on (default: {DEFAULT_PORT})")
+    parser.add_argument("--max-age", type=int, default=DEFAULT_MAX_AGE,
+                        help=f"Seconds clients may cache a lookup (default: {DEFAULT_MAX_AGE})")
+    parser.add_argument("--reload-interval", type=float, default=DEFAULT_RELOAD_INTERVAL,
+                        help=f"Seconds between the checks for a new index (default: {DEFAULT_RELOAD_INTERVAL})")
+    parser.add_argument("--log-level", default="INFO", help="Log level (default: INFO)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    instrumentation.configure_logging(args.log_level)
+    try:
+        lookup_index = LookupIndex.from_index_file(args.index)
+    except (OSError, sqlite3.Error) as err:
+        print(f"Cannot load the build index: {err}")
+        sys.exit(1)
+    server = LookupServer((args.host, args.port), lookup_index, max_age=args.max_age)
+    reloader = IndexReloader(server, args.index, args.reload_interval)
+    reloader.start()
+    logging.info(f"Serving {len(lookup_index.by_build)} build numbers on http://{args.host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        reloader.stop()
+        server.server_close()
@@ -25,9 +25,21 @@ __status__ = "beta"
 __version__ = "0.3.0"
 
 # Imports
-from data_handling import create_json_output
-from kb_data import KbData, Kb2143838, Kb2143850, Kb52075
-from webparsing import parse_kb_article_ids
+from data_handling import create_json_outputs, missing_dependencies, JSONRECORDS, OUTPUT_FORMATS, COMPRESSIONS, \
+    DEFAULT_WRITE_WORKERS
+import instrumentation
+from build_index import BuildIndexWriter, BUILD_INDEX_FILENAME
+from consolidation import consolidate_release_tables, create_consolidated_outputs, CONSOLIDATED_NAME
+from date_parsing import DateFormatCache
+from delta_feed import DeltaFeed, DELTA_DIRNAME
+from publisher import OutputPublisher
+from kb_cache import KbCache, DEFAULT_CACHE_DIR, DEFAULT_CACHE_TTL, DEFAULT_CACHE_MAX_BYTES
+from kb_data import create_kb_object, matches_product, parse_kb_articles
+from run_manifest import RunManifest, hash_kb_article, PARSER_VERSION
+from webparsing import parse_kb_article_ids, fetch_kb_articles, iter_kb_articles, create_kb_session, RetryPolicy, \
+    DEFAULT_FETCH_WORKERS, DEFAULT_TIMEOUT, DEFAULT_RETRIES, DEFAULT_RATE_LIMIT
+import argparse
+import gc
 import os
 import logging
 
@@ -36,33 +48,283 @@ import logging
 MASTERKBID = 1014508
 # The relative directory where the output it stored (used in GH actions, so beware)
 OUTPUTBASEDIR = "outputs"
-# The "simple" JSON data orientation types. Index is a bit more tricky as the DF need remodeling.
-JSONRECORDS = ["records", "table", "index"]
+# Copied into the outputs by the GitHub workflow after the run
+README_FILENAME = "README.md"
+
+
+def parse_arguments():
+    """Returns the parsed command line arguments"""
+    parser = argparse.ArgumentParser(description="Transform VMware product release KBs to machine-readable JSON")
+    parser.add_argument("--workers", type=int, default=DEFAULT_FETCH_WORKERS,
+                        help=f"Number of KB articles fetched in parallel (default: {DEFAULT_FETCH_WORKERS})")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT,
+                        help=f"Seconds to wait for a connection or response of the KB API (default: {DEFAULT_TIMEOUT})")
+    parser.add_argument("--retries", type=int, default=DEFAULT_RETRIES,
+                        help=f"Retries of a failed or throttled request (default: {DEFAULT_RETRIES})")
+    parser.add_argument("--rate-limit", type=float, default=DEFAULT_RATE_LIMIT,
+                        help=f"Requests per second to the KB API, lowered automatically when throttled, 0 for no limit "
+                             f"(default: {DEFAULT_RATE_LIMIT})")
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="Number of processes parsing the KB articles, 0 uses all cores (default: 1)")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR,
+                        help=f"Directory for the on-disk KB article cache (default: {DEFAULT_CACHE_DIR})")
+    parser.add_argument("--cache-ttl", type=float, default=DEFAULT_CACHE_TTL,
+                        help=f"Seconds a cached article is used without revalidation (default: {DEFAULT_CACHE_TTL})")
+    parser.add_argument("--cache-max-mb", type=float, default=DEFAULT_CACHE_MAX_BYTES / (1024 * 1024),
+                        help="Size limit of the article cache in MiB, least recently used articles are evicted")
+    parser.add_argument("--no-cache", action="store_true", help="Always fetch from the KB API, bypassing the cache")
+    parser.add_argument("--offline", action="store_true", help="Run from the article cache only, no network access")
+    parser.add_argument("--formats", nargs="+", default=JSONRECORDS, choices=OUTPUT_FORMATS,
+                        help=f"JSON data orientations and table formats to write (default: {' '.join(JSONRECORDS)})")
+    parser.add_argument("--compress", nargs="+", default=[], choices=list(COMPRESSIONS),
+                        help="Also write precompressed copies of the JSON files as .json.gz (gzip) or .json.br (br)")
+    parser.add_argument("--compact", action="store_true",
+                        help="Write the JSON files without indentation")
+    parser.add_argument("--write-workers", type=int, default=DEFAULT_WRITE_WORKERS,
+                        help=f"Number of output files written in parallel (default: {DEFAULT_WRITE_WORKERS})")
+    parser.add_argument("--consolidate", action="store_true",
+                        help="Also write one release table of all products (all_products_releases) in every format")
+    parser.add_argument("--delta", action="store_true",
+                        help=f"Write the rows added, removed or modified since the previous run to {OUTPUTBASEDIR}/delta")
+    parser.add_argument("--kb", type=int, nargs="+", default=[], metavar="KB_ID",
+                        help="Only process these KB ids, the other KBs are not even fetched")
+    parser.add_argument("--exclude-kb", type=int, nargs="+", default=[], metavar="KB_ID",
+                        help="Don't process these KB ids")
+    parser.add_argument("--product", nargs="+", default=[],
+                        help="Only process KBs whose product name contains one of these strings (case-insensitive)")
+    parser.add_argument("--exclude-product", nargs="+", default=[], metavar="PRODUCT",
+                        help="Don't process KBs whose product name contains one of these strings (case-insensitive)")
+    parser.add_argument("--streaming", action="store_true",
+                        help="Low-memory mode: fetch, parse, write and release one KB after the other")
+    parser.add_argument("--memory-budget", type=float, metavar="MB",
+                        help="Resident memory the run should stay below, implies --streaming")
+    parser.add_argument("--force", action="store_true",
+                        help="Rebuild all KBs, even those with an unchanged title, product and resolution section")
+    parser.add_argument("--log-level", default="INFO", choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+                        help="Log level of the messages written to stderr (default: INFO)")
+    parser.add_argument("--report", action="store_true",
+                        help=f"Write per-stage and per-KB timings and sizes to {OUTPUTBASEDIR}/run_report.json")
+    parser.add_argument("--profile", metavar="DIR",
+                        help="Also profile every stage with cProfile into DIR/<stage>.pstats (implies --report)")
+    args = parser.parse_args()
+    if args.offline and args.no_cache:
+        parser.error("--offline needs the article cache, it cannot be combined with --no-cache")
+    for missing_dependency in missing_dependencies(args.formats, args.compress):
+        parser.error(missing_dependency)
+    if args.memory_budget is not None:
+        args.streaming = True
+    return args
+
+
+def is_selected(kb_id, product, args):
+    """True if a KB passes the KB id and product filters, the product filters are skipped while the product is unknown"""
+    if (args.kb and kb_id not in args.kb) or kb_id in args.exclude_kb:
+        return False
+    if product is None:
+        return True
+    if args.product and not matches_product(product, args.product):
+        return False
+    return not (args.exclude_product and matches_product(product, args.exclude_product))
+
+
+def articles_to_rebuild(fetched_articles, args, run_manifest, build_index, article_hashes, unchanged_kbs,
+                        delta_feed=None):
+    """Yields the fetched (kb id, article) tuples that need parsing: selected KBs with a changed article hash
+    and unchanged ones needed for the consolidated table or missing from the delta snapshot (all of them in the
+    first delta run). Skipped KBs are recorded in the manifest and the run report."""
+    partial_run = bool(args.kb or args.exclude_kb or args.product or args.exclude_product)
+    for kb_id, raw_html_article in fetched_articles:
+        if raw_html_article is None:
+            # Could not be fetched, its files from the previous run are kept
+            run_manifest.keep(kb_id)
+            continue
+        try:
+            kb_object = create_kb_object(kb_id, raw_html_article)
+            if partial_run and not is_selected(kb_id, kb_object.product, args):
+                run_manifest.keep(kb_id)
+                continue
+            article_hash = hash_kb_article(kb_object)
+        except (ValueError, KeyError, IndexError) as err:
+            logging.warning(f"Cannot handle data from {kb_id} without breaking: {err}")
+            instrumentation.record_status(kb_id, "failed", str(err))
+            # Its files from the previous run are kept
+            run_manifest.keep(kb_id)
+            continue
+        # Keep the files from the previous run if the title, product and resolution section did not change
+        if not args.force and run_manifest.is_unchanged(kb_id, article_hash) and build_index.has_kb(kb_id):
+            logging.info(f"Skipping KB id {kb_id}, title, product and resolution section unchanged")
+            run_manifest.keep(kb_id)
+            instrumentation.record_status(kb_id, "unchanged")
+            if args.consolidate or (delta_feed is not None and not delta_feed.has_kb(kb_id)):
+                unchanged_kbs.add(kb_id)
+                yield kb_id, raw_html_article
+            continue
+        article_hashes[kb_id] = article_hash
+        yield kb_id, raw_html_article
+
+
+def enforce_memory_budget(args):
+    """Frees memory if the process is over its budget, if that is not enough the outputs are written by one thread"""
+    if args.memory_budget is None:
+        return
+    memory_budget = args.memory_budget * 1024 * 1024
+    if instrumentation.current_rss_bytes() <= memory_budget:
+        return
+    gc.collect()
+    resident_bytes = instrumentation.current_rss_bytes()
+    if resident_bytes > memory_budget and args.write_workers > 1:
+        logging.warning(f"{resident_bytes / (1024 * 1024):.0f} MiB resident, over the memory budget of "
+                        f"{args.memory_budget:.0f} MiB: writing the outputs with a single thread")
+        args.write_workers = 1
+
+
+def check_memory_budget(args, exceeded: bool = False):
+    """Returns True if the peak resident memory went over the budget, logs a warning the first time it does (when
+    exceeded is still False)"""
+    peak_rss = instrumentation.peak_rss_bytes()
+    if args.memory_budget is None or peak_rss is None or peak_rss <= args.memory_budget * 1024 * 1024:
+        return exceeded
+    if not exceeded:
+        logging.warning(f"Peak resident memory of {peak_rss / (1024 * 1024):.0f} MiB is over the memory budget of "
+                        f"{args.memory_budget:.0f} MiB")
+    return True
+
 
 if __name__ == "__main__":
+    args = parse_arguments()
+    instrumentation.configure_logging(args.log_level)
+    run_report = None
+    if args.report or args.profile:
+        run_report = instrumentation.RunReport(profile_dir=args.profile)
+        instrumentation.activate(run_report)
     # Create output directory
     if not os.path.exists(OUTPUTBASEDIR):
         os.makedirs(OUTPUTBASEDIR)
-    vmware_release_kbs = parse_kb_article_ids(MASTERKBID)
-    for kb_id in vmware_release_kbs:
-        logging.info(f"Creating object for KB id {kb_id}")
-        # Handle specific KBs by using extra Classes.
-        # KB2143838: vCenter
-        # KB2143850: vRA
-        # KB52075: vxrail
-        if kb_id == 2143838:
-            kb_article = Kb2143838(kb_id)
-        elif kb_id == 2143850:
-            kb_article = Kb2143850(kb_id)
-        elif kb_id == 52075:
-            kb_article = Kb52075(kb_id)
-        else:
-            try:
-                # Pass on the KB id to the data object to fill it
-                kb_article = KbData(kb_id=kb_id)
-            except ValueError as err:
-                print(f"cannot handle data from {kb_article.id} without breaking: {err}")
+    kb_cache = None
+    if not args.no_cache:
+        kb_cache = KbCache(cache_dir=args.cache_dir, ttl=args.cache_ttl,
+                           max_bytes=int(args.cache_max_mb * 1024 * 1024), offline=args.offline)
+    # Other output options invalidate the files of the previous run as well
+    output_version = (f"{PARSER_VERSION}/{'+'.join(args.formats)}{'/compact' if args.compact else ''}"
+                      f"{''.join('/' + compression for compression in args.compress)}")
+    # All files are written to a staging directory and published at the end, unchanged files are not touched
+    publisher = OutputPublisher(OUTPUTBASEDIR)
+    staging_dir = publisher.staging_dir
+    run_manifest = RunManifest(OUTPUTBASEDIR, parser_version=output_version, staging_dir=staging_dir)
+    # One lookup index of all build numbers, KBs that are not rebuilt keep their rows
+    build_index = BuildIndexWriter(publisher.staged_copy(BUILD_INDEX_FILENAME))
+    delta_feed = DeltaFeed(OUTPUTBASEDIR, staging_dir=staging_dir) if args.delta else None
+    # Shared by all requests, so every fetch thread slows down when the KB API throttles
+    retry_policy = RetryPolicy(timeout=args.timeout, retries=args.retries, rate_limit=args.rate_limit)
+    # One keep-alive session for the master KB and all sub-articles
+    fetched_articles = None
+    try:
+        with instrumentation.stage("fetch"), create_kb_session(args.workers, retry_policy) as kb_session:
+            vmware_release_kbs = parse_kb_article_ids(MASTERKBID, session=kb_session, cache=kb_cache)
+            # The products indexed in previous runs filter KBs before they are fetched
+            known_products = build_index.indexed_products()
+            selected_kbs = [kb_id for kb_id in vmware_release_kbs
+                            if is_selected(kb_id, known_products.get(kb_id), args)]
+            if args.streaming:
+                # Fetched while the KBs are processed, with its own session as this one is closed by then. The time
+                # spent waiting for each article counts for the fetch stage.
+                fetched_articles = instrumentation.timed_iter(
+                    iter_kb_articles(selected_kbs, max_workers=args.workers, cache=kb_cache,
+                                     retry_policy=retry_policy), "fetch")
+            else:
+                fetched_articles = fetch_kb_articles(selected_kbs, max_workers=args.workers, session=kb_session,
+                                                     cache=kb_cache)
+    finally:
+        # The streaming fetch goes on while the KBs are processed, its cache is saved after the processing loop
+        if kb_cache is not None and (not args.streaming or fetched_articles is None):
+            kb_cache.save()
+    # KBs left out keep their files from the previous run
+    for kb_id in set(vmware_release_kbs) - set(selected_kbs):
+        run_manifest.keep(kb_id)
+    article_hashes = {}
+    # KBs only parsed for the consolidated table or the delta snapshot, their files are kept
+    unchanged_kbs = set()
+    release_tables = []
+    over_memory_budget = False
+    articles_to_parse = articles_to_rebuild(fetched_articles, args, run_manifest, build_index, article_hashes,
+                                            unchanged_kbs, delta_feed)
+    # The date formats detected in previous runs are tried first
+    date_format_cache = None if args.no_cache else DateFormatCache(args.cache_dir)
+    known_date_formats = {kb_id: date_format_cache.get(kb_id) for kb_id in selected_kbs} \
+        if date_format_cache is not None else {}
+    # Parsing is CPU-bound, it can fan out to a process pool while the outputs are written here
+    parsed_articles = parse_kb_articles(articles_to_parse, jobs=args.jobs, date_formats=known_date_formats)
+    try:
+        for kb_id, kb_article, parse_error in instrumentation.timed_iter(parsed_articles, "parse"):
+            if parse_error is not None:
+                logging.warning(f"Cannot handle data from {kb_id} without breaking: {parse_error}")
+                instrumentation.record_status(kb_id, "failed", parse_error)
+                run_manifest.keep(kb_id)
+                continue
+            if date_format_cache is not None:
+                date_format_cache.update(kb_id, kb_article.date_formats)
+            for column_key, unparsed_values in kb_article.unparsed_dates.items():
+                logging.warning(f"KB id {kb_id}: {column_key} has values that are no date: {unparsed_values}")
+            if args.consolidate:
+                release_tables.append((kb_id, kb_article.product, kb_article.list_of_dframes))
+            if kb_id in unchanged_kbs:
+                if delta_feed is not None and not delta_feed.has_kb(kb_id):
+                    delta_feed.update_kb(kb_article)
+                continue
+            logging.info(f"Parsed {len(kb_article.list_of_dframes)} tables from KB id {kb_id}")
+            instrumentation.record_parse(kb_id, kb_article.parse_seconds,
+                                         len(kb_article.list_of_dframes) + len(kb_article.list_of_merged_frames or {}),
+                                         sum(len(dataframe) for dataframe in kb_article.list_of_dframes),
+                                         kb_article.unparsed_dates)
             # Create outputs
-        for record_type in JSONRECORDS:
-                create_json_output(kb_dataobject=kb_article, output_base_dir=OUTPUTBASEDIR, record_type=record_type)
-
+            with instrumentation.stage("output"):
+                build_index.replace_kb(kb_article)
+                if delta_feed is not None:
+                    delta_feed.update_kb(kb_article)
+                output_files = create_json_outputs(kb_dataobject=kb_article, output_base_dir=staging_dir,
+                                                   record_types=args.formats, compact=args.compact,
+                                                   max_workers=args.write_workers, compressions=args.compress)
+            run_manifest.record(kb_id, article_hashes[kb_id], output_files)
+            instrumentation.record_status(kb_id, "rebuilt")
+            if args.streaming:
+                # Only the tables kept for the consolidated table stay in memory
+                kb_article.release()
+                del kb_article
+                enforce_memory_budget(args)
+                over_memory_budget = check_memory_budget(args, over_memory_budget)
+    finally:
+        if args.streaming and kb_cache is not None:
+            kb_cache.save()
+    # Published files kept without being written again, all others (e.g. of KBs no longer listed in the master KB or
+    # with a renamed product) are left out of the new release
+    kept_files = run_manifest.output_files() | set(publisher.published_files(DELTA_DIRNAME)) | {README_FILENAME}
+    if args.consolidate and (args.kb or args.exclude_kb or args.product or args.exclude_product):
+        logging.warning("Not writing the consolidated table, it needs all KBs and this run is filtered")
+        kept_files.update(published_file for published_file in publisher.published_files()
+                          if os.path.basename(published_file).startswith(f"{CONSOLIDATED_NAME}_as-"))
+    elif args.consolidate:
+        with instrumentation.stage("consolidate"):
+            consolidated = consolidate_release_tables(release_tables)
+            create_consolidated_outputs(consolidated, staging_dir, args.formats, compact=args.compact,
+                                        compressions=args.compress)
+        logging.info(f"Consolidated {len(consolidated)} releases of {len(release_tables)} KBs")
+    if date_format_cache is not None:
+        date_format_cache.save()
+    if delta_feed is not None:
+        delta_feed.finish(vmware_release_kbs)
+        changelog = delta_feed.write()
+        logging.info(f"Delta since the previous run: {changelog['added']} added, {changelog['removed']} removed, "
+                     f"{changelog['modified']} modified rows")
+    run_manifest.save()
+    build_index.keep_only(vmware_release_kbs)
+    build_index.close()
+    if args.memory_budget is not None:
+        over_memory_budget = check_memory_budget(args, over_memory_budget)
+        instrumentation.record_memory_budget(int(args.memory_budget * 1024 * 1024), over_memory_budget)
+    if run_report is not None:
+        run_report.write(staging_dir)
+    replaced_files, unchanged_files = publisher.publish(kept_files)
+    logging.info(f"Published {replaced_files} changed files to {OUTPUTBASEDIR}, {unchanged_files} were unchanged")
+    peak_rss = instrumentation.peak_rss_bytes()
+    if peak_rss is not None:
+        logging.info(f"Peak resident memory: {peak_rss / (1024 * 1024):.0f} MiB")
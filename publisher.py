@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+""" publisher.py: Provides resolution table from VMware KBs as machine-readable json files.
+VMware KBs provide release information only as a human-readable HTML table.
+However, for automation it would be nice to have it in a machine-readable format.
+This script takes the tables from a VMware KB page and provides a json-file as an output.
+
+This program is free software: you can redistribute it and/or modify it under
+the terms of the GNU General Public License as published by the Free Software
+Foundation, either version 3 of the License, or (at your option) any later
+version.
+This program is distributed in the hope that it will be useful, but WITHOUT
+ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+You should have received a copy of the GNU General Public License along with
+this program. If not, see <http://www.gnu.org/licenses/>.
+"""
+
+__author__ = "Dominik Zorgnotti"
+__contact__ = "dominik@why-did-it.fail"
+__created__ = "2026-10-17"
+__deprecated__ = False
+__contact__ = "dominik@why-did-it.fail"
+__license__ = "GPLv3"
+__status__ = "beta"
+__version__ = "0.1.0"
+
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+from datetime import datetime, timezone
+
+CHECKSUMS_FILENAME = "checksums.json"
+# Read in chunks, output files of all products can get large
+HASH_CHUNK_SIZE = 1024 * 1024
+# Complete trees of published files, the outputs directory is a symlink to one of them
+RELEASES_SUFFIX = ".releases"
+# The current release and the one before, for readers that resolved the symlink before it was flipped
+KEPT_RELEASES = 2
+# Where outputs that were still a plain directory are moved when they become a symlink
+UNVERSIONED_RELEASE = "unversioned"
+
+
+def file_sha256(file_path: str):
+    """Returns the SHA-256 hex digest of a file"""
+    sha256 = hashlib.sha256()
+    with open(file_path, "rb") as file_fh:
+        for chunk in iter(lambda: file_fh.read(HASH_CHUNK_SIZE), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def relative_files(directory: str):
+    """Returns the paths of all files below a directory, relative to it and with forward slashes"""
+    files = []
+    for root, _, filenames in os.walk(directory):
+        for filename in filenames:
+            files.append(os.path.relpath(os.path.join(root, filename), directory).replace(os.sep, "/"))
+    return files
+
+
+def link_or_copy(source_file: str, target_file: str):
+    """Hardlinks a file into another tree, copies it where the file system has no hardlinks"""
+    os.makedirs(os.path.dirname(target_file), exist_ok=True)
+    try:
+        os.link(source_file, target_file)
+    except OSError:
+        shutil.copy2(source_file, target_file)
+
+
+class OutputPublisher:
+    """Collects the files of a run in a staging directory next to the outputs and publishes them at the end.
+    The outputs directory is a symlink to a complete tree of published files in <outputs>.releases. Publishing
+    builds a new tree from the changed files and hardlinks of the unchanged ones, then flips the symlink with an
+    atomic rename, so readers see either the whole previous or the whole new dataset. checksums.json lists the
+    SHA-256 and size of every published file."""
+
+    def __init__(self, output_base_dir: str):
+        self.output_base_dir = output_base_dir
+        self.staging_dir = f"{os.path.normpath(output_base_dir)}.staging"
+        self.releases_dir = f"{os.path.normpath(output_base_dir)}{RELEASES_SUFFIX}"
+        self.checksums_file = os.path.join(output_base_dir, CHECKSUMS_FILENAME)
+        # Left over by a run that did not finish, none of it was published
+        if os.path.exists(self.staging_dir):
+            shutil.rmtree(self.staging_dir)
+        os.makedirs(self.staging_dir)
+
+    def staged_path(self, relative_path: str):
+        """Returns the path of a file in the staging directory"""
+        return os.path.join(self.staging_dir, relative_path)
+
+    def staged_copy(self, relative_path: str):
+        """Copies a published file into the staging directory, for files updated rather than rewritten by a run
+        (e.g. an appended feed or a database). Returns the staging path."""
+        staged_file = self.staged_path(relative_path)
+        published_file = os.path.join(self.output_base_dir, relative_path)
+        os.makedirs(os.path.dirname(staged_file), exist_ok=True)
+        if os.path.exists(published_file):
+            shutil.copy2(published_file, staged_file)
+        return staged_file
+
+    def load_checksums(self):
+        """Returns the checksums of the previous publication as dict of relative path and {sha256, size}"""
+        if not os.path.exists(self.checksums_file):
+            return {}
+        try:
+            with open(self.checksums_file, "r", encoding="utf-8") as checksums_fh:
+                return json.load(checksums_fh)["files"]
+        except (OSError, ValueError, KeyError) as err:
+            logging.warning(f"Ignoring unreadable checksums {self.checksums_file}: {err}")
+            return {}
+
+    def published_checksum(self, relative_path: str, checksums):
+        """Returns the checksum entry of a published file, from the previous checksums if its size still matches"""
+        published_file = os.path.join(self.output_base_dir, relative_path)
+        if not os.path.exists(published_file):
+            return None
+        size = os.path.getsize(published_file)
+        previous = checksums.get(relative_path)
+        if previous is not None and previous["size"] == size:
+            return previous
+        return {"sha256": file_sha256(published_file), "size": size}
+
+    def published_files(self, directory: str = ""):
+        """Returns the relative paths of the published files, optionally only those below a directory of the outputs"""
+        published_dir = os.path.join(self.output_base_dir, directory)
+        if not os.path.isdir(published_dir):
+            return []
+        return [f"{directory}/{relative_path}" if directory else relative_path
+                for relative_path in relative_files(published_dir)]
+
+    def publish(self, kept_files=None):
+        """Publishes the staged files as a new release of the outputs: staged files identical to the published ones
+        and the kept files the run did not stage (e.g. of unchanged KBs) are hardlinked from the current release,
+        changed files are moved in. Published files that are neither staged nor kept are left out, kept_files=None
+        keeps all of them. Writes checksums.json, flips the outputs symlink to the new release and removes the
+        staging directory.
+        Returns a tuple of (number of files replaced, number of identical files skipped)."""
+        checksums = self.load_checksums()
+        release_dir = self.new_release_dir()
+        published_files = set(self.published_files())
+        staged_files = set(relative_files(self.staging_dir))
+        if kept_files is not None:
+            published_files &= set(kept_files) | staged_files
+        release_checksums = {}
+        replaced, unchanged = 0, 0
+        for relative_path in sorted(published_files | staged_files):
+            if relative_path == CHECKSUMS_FILENAME or relative_path.endswith(".tmp"):
+                continue
+            release_file = os.path.join(release_dir, relative_path)
+            published_checksum = self.published_checksum(relative_path, checksums)
+            if relative_path in staged_files:
+                staged_file = self.staged_path(relative_path)
+                staged_checksum = {"sha256": file_sha256(staged_file), "size": os.path.getsize(staged_file)}
+                if published_checksum != staged_checksum:
+                    os.makedirs(os.path.dirname(release_file), exist_ok=True)
+                    os.replace(staged_file, release_file)
+                    release_checksums[relative_path] = staged_checksum
+                    replaced += 1
+                    continue
+                unchanged += 1
+            link_or_copy(os.path.join(self.output_base_dir, relative_path), release_file)
+            release_checksums[relative_path] = published_checksum
+        with open(os.path.join(release_dir, CHECKSUMS_FILENAME), "w", encoding="utf-8") as checksums_fh:
+            json.dump({"files": release_checksums}, checksums_fh, indent=4, sort_keys=True)
+        self.switch_release(release_dir)
+        shutil.rmtree(self.staging_dir)
+        self.remove_old_releases()
+        return replaced, unchanged
+
+    def new_release_dir(self):
+        """Creates and returns an empty directory for the next release, named after the current time"""
+        release_name = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H%M%S.%fZ")
+        release_dir = os.path.join(self.releases_dir, release_name)
+        os.makedirs(release_dir)
+        return release_dir
+
+    def switch_release(self, release_dir: str):
+        """Points the outputs symlink to a release with an atomic rename.
+        Outputs that are still a plain directory (e.g. restored from an older cache) are moved aside first, only
+        this one switch leaves a moment without outputs."""
+        if os.path.isdir(self.output_base_dir) and not os.path.islink(self.output_base_dir):
+            unversioned_dir = os.path.join(self.releases_dir, UNVERSIONED_RELEASE)
+            if os.path.exists(unversioned_dir):
+                shutil.rmtree(unversioned_dir)
+            os.replace(self.output_base_dir, unversioned_dir)
+        temp_link = f"{os.path.normpath(self.output_base_dir)}.tmp"
+        if os.path.lexists(temp_link):
+            os.remove(temp_link)
+        os.symlink(os.path.relpath(release_dir, os.path.dirname(os.path.abspath(self.output_base_dir))), temp_link)
+        os.replace(temp_link, self.output_base_dir)
+
+    def remove_old_releases(self):
+        """Removes all releases but the newest KEPT_RELEASES, the current one is always kept"""
+        current_release = os.path.basename(os.path.realpath(self.output_base_dir))
+        releases = sorted(name for name in os.listdir(self.releases_dir) if name != UNVERSIONED_RELEASE)
+        for release_name in releases[:-KEPT_RELEASES] + [UNVERSIONED_RELEASE]:
+            release_dir = os.path.join(self.releases_dir, release_name)
+            if release_name != current_release and os.path.isdir(release_dir):
+                shutil.rmtree(release_dir)
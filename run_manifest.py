@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+""" run_manifest.py: Provides resolution table from VMware KBs as machine-readable json files.
+VMware KBs provide release information only as a human-readable HTML table.
+However, for automation it would be nice to have it in a machine-readable format.
+This script takes the tables from a VMware KB page and provides a json-file as an output.
+
+This program is free software: you can redistribute it and/or modify it under
+the terms of the GNU General Public License as published by the Free Software
+Foundation, either version 3 of the License, or (at your option) any later
+version.
+This program is distributed in the hope that it will be useful, but WITHOUT
+ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+You should have received a copy of the GNU General Public License along with
+this program. If not, see <http://www.gnu.org/licenses/>.
+"""
+
+__author__ = "Dominik Zorgnotti"
+__contact__ = "dominik@why-did-it.fail"
+__created__ = "2026-10-17"
+__deprecated__ = False
+__contact__ = "dominik@why-did-it.fail"
+__license__ = "GPLv3"
+__status__ = "beta"
+__version__ = "0.1.0"
+
+import hashlib
+import json
+import logging
+import os
+
+import build_index
+import data_handling
+import date_parsing
+import kb_data
+import table_extraction
+import versions
+
+MANIFEST_FILENAME = "run_manifest.json"
+# Modules whose code decides the content of the files kept for an unchanged KB
+PARSER_MODULES = [kb_data, table_extraction, date_parsing, data_handling, build_index, versions]
+
+
+def hash_parser_modules(modules=PARSER_MODULES):
+    """Returns a short SHA-256 hex digest of the source files of the parsing and output modules.
+    A code change invalidates the previous results even if nobody bumped a __version__."""
+    sha256 = hashlib.sha256()
+    for module in modules:
+        with open(module.__file__, "rb") as module_fh:
+            sha256.update(module_fh.read())
+    return sha256.hexdigest()[:16]
+
+
+# Any change to the parsing or output code invalidates all previous results
+PARSER_VERSION = f"kb_data-{kb_data.__version__}/data_handling-{data_handling.__version__}/{hash_parser_modules()}"
+
+
+def hash_kb_article(kb_object):
+    """Returns the SHA-256 hex digest of the title, product and resolution section of a KB object, the product names
+    the output files and the title and product label the releases"""
+    sha256 = hashlib.sha256()
+    for part in (kb_object.title, kb_object.product, kb_object.raw_html_resolution):
+        sha256.update(part.encode("utf-8"))
+        # Keeps the parts apart, e.g. a word moved from the title to the product changes the hash
+        sha256.update(b"\0")
+    return sha256.hexdigest()
+
+
+class RunManifest:
+    """Remembers the article hash and output files of every KB from the previous run in the output directory"""
+
+    def __init__(self, output_base_dir: str, parser_version: str = PARSER_VERSION, staging_dir=None):
+        self.output_base_dir = output_base_dir
+        self.manifest_file = os.path.join(output_base_dir, MANIFEST_FILENAME)
+        # The files of this run are written to a staging directory first, if any
+        self.staging_dir = staging_dir or output_base_dir
+        self.parser_version = parser_version
+        manifest = self.load()
+        same_version = manifest.get("parser_version") == self.parser_version
+        self.previous_kbs = manifest.get("kbs", {}) if same_version else {}
+        # Entries made by another parser version, only their files are kept for KBs that cannot be rebuilt
+        self.outdated_kbs = {} if same_version else manifest.get("kbs", {})
+        self.current_kbs = {}
+
+    def load(self):
+        """Returns the manifest of the previous run, an empty dict if there is none"""
+        if not os.path.exists(self.manifest_file):
+            return {}
+        try:
+            with open(self.manifest_file, "r", encoding="utf-8") as manifest_fh:
+                return json.load(manifest_fh)
+        except (OSError, ValueError) as err:
+            logging.warning(f"Ignoring unreadable run manifest {self.manifest_file}: {err}")
+            return {}
+
+    def is_unchanged(self, kb_id, article_hash: str):
+        """True if the KB had the same title, product and resolution section in the previous run and all its files are
+        still there"""
+        previous = self.previous_kbs.get(str(kb_id))
+        # Manifests of older versions only have the hash of the resolution section
+        if previous is None or previous.get("article_sha256") != article_hash:
+            return False
+        return all(os.path.exists(os.path.join(self.output_base_dir, output_file)) for output_file in previous["files"])
+
+    def keep(self, kb_id):
+        """Carries the entry of an unchanged, failed or not selected KB over to this run, if the previous run had one.
+        An entry of another parser version keeps its files but not its hash, the KB is rebuilt in the next run."""
+        if str(kb_id) in self.previous_kbs:
+            self.current_kbs[str(kb_id)] = self.previous_kbs[str(kb_id)]
+        elif str(kb_id) in self.outdated_kbs:
+            self.current_kbs[str(kb_id)] = dict(self.outdated_kbs[str(kb_id)], article_sha256=None)
+
+    def record(self, kb_id, article_hash: str, output_files):
+        """Stores the article hash and the written files of a rebuilt KB, paths are kept relative to the outputs"""
+        self.current_kbs[str(kb_id)] = {
+            "article_sha256": article_hash,
+            "files": sorted(os.path.relpath(output_file, self.staging_dir).replace(os.sep, "/")
+                            for output_file in output_files),
+        }
+
+    def output_files(self):
+        """Returns the set of output files of all KBs in this run's manifest, relative to the outputs"""
+        return {output_file for kb_entry in self.current_kbs.values() for output_file in kb_entry["files"]}
+
+    def save(self):
+        """Atomically writes the manifest of this run to the output (or staging) directory"""
+        manifest = {
+            "parser_version": self.parser_version,
+            "kbs": self.current_kbs,
+        }
+        manifest_file = os.path.join(self.staging_dir, MANIFEST_FILENAME)
+        temp_file = f"{manifest_file}.tmp"
+        with open(temp_file, "w", encoding="utf-8") as manifest_fh:
+            json.dump(manifest, manifest_fh, indent=4, sort_keys=True)
+        os.replace(temp_file, manifest_file)
@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+""" table_extraction.py: Provides resolution table from VMware KBs as machine-readable json files.
+VMware KBs provide release information only as a human-readable HTML table.
+However, for automation it would be nice to have it in a machine-readable format.
+This script takes the tables from a VMware KB page and provides a json-file as an output.
+
+This program is free software: you can redistribute it and/or modify it under
+the terms of the GNU General Public License as published by the Free Software
+Foundation, either version 3 of the License, or (at your option) any later
+version.
+This program is distributed in the hope that it will be useful, but WITHOUT
+ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+You should have received a copy of the GNU General Public License along with
+this program. If not, see <http://www.gnu.org/licenses/>.
+"""
+
+__author__ = "Dominik Zorgnotti"
+__contact__ = "dominik@why-did-it.fail"
+__created__ = "2026-10-17"
+__deprecated__ = False
+__contact__ = "dominik@why-did-it.fail"
+__license__ = "GPLv3"
+__status__ = "beta"
+__version__ = "0.1.0"
+
+import re
+import unicodedata
+
+import pandas as pd
+from lxml import html as lxml_html
+from pandas.io.parsers import TextParser
+
+# Same whitespace handling as pd.read_html: line breaks and runs of whitespace become a single space
+RE_WHITESPACE = re.compile(r"[\r\n]+|\s{2,}")
+RE_HIDDEN_STYLE = re.compile(r"display:\s*none")
+# Any text (except line breaks) marks a table as non-empty, like the default match of pd.read_html
+RE_ANY_TEXT = re.compile(r".+")
+
+
+class ExtractedTable:
+    """The text of one HTML table, split in header, body and footer rows with colspan/rowspan already expanded"""
+
+    def __init__(self, header, body, footer):
+        self.header = header
+        self.body = body
+        self.footer = footer
+
+    @property
+    def columns(self):
+        """The body of the table as a list of columns"""
+        return [list(column) for column in zip(*self.body)]
+
+
+def normalize_cell_text(text: str, unicode_form=None):
+    """Collapses whitespace like pd.read_html and optionally normalizes the unicode form (e.g. NFKD)"""
+    if unicode_form is not None:
+        text = unicodedata.normalize(unicode_form, text)
+    return RE_WHITESPACE.sub(" ", text.strip())
+
+
+def is_hidden(element):
+    """True if the element is hidden by an inline style"""
+    return RE_HIDDEN_STYLE.search(element.get("style", "")) is not None
+
+
+def row_cells(row):
+    """Returns the td/th cells of a table row, nested tables are not descended into"""
+    return [cell for cell in row if cell.tag in ("td", "th")]
+
+
+def expand_spans(rows, unicode_form=None):
+    """Turns a list of <tr> elements into text rows, cells with rowspan/colspan are copied to the spanned cells.
+    Follows the rules of pd.read_html so that ragged tables come out the same."""
+    all_texts = []
+    # List of (column index, text, remaining rows) from cells spanning into the next rows
+    remainder = []
+    for row in rows:
+        texts = []
+        next_remainder = []
+        index = 0
+        for cell in row_cells(row):
+            while remainder and remainder[0][0] <= index:
+                prev_index, prev_text, prev_rowspan = remainder.pop(0)
+                texts.append(prev_text)
+                if prev_rowspan > 1:
+                    next_remainder.append((prev_index, prev_text, prev_rowspan - 1))
+                index += 1
+            text = normalize_cell_text(cell.text_content(), unicode_form)
+            rowspan = int(cell.get("rowspan") or 1)
+            colspan = int(cell.get("colspan") or 1)
+            for _ in range(colspan):
+                texts.append(text)
+                if rowspan > 1:
+                    next_remainder.append((index, text, rowspan - 1))
+                index += 1
+        for prev_index, prev_text, prev_rowspan in remainder:
+            texts.append(prev_text)
+            if prev_rowspan > 1:
+                next_remainder.append((prev_index, prev_text, prev_rowspan - 1))
+        all_texts.append(texts)
+        remainder = next_remainder
+    # Rows that only exist because of a rowspan in the last row
+    while remainder:
+        next_remainder = []
+        texts = []
+        for prev_index, prev_text, prev_rowspan in remainder:
+            texts.append(prev_text)
+            if prev_rowspan > 1:
+                next_remainder.append((prev_index, prev_text, prev_rowspan - 1))
+        all_texts.append(texts)
+        remainder = next_remainder
+    return all_texts
+
+
+def extract_table_text(table, unicode_form=None):
+    """Splits a <table> element in header, body and footer text rows.
+    Without a <thead>, leading rows consisting only of <th> cells are the header. Like the CSS selectors of
+    pd.read_html, a row counts as body row if it is inside any <tbody>, also one around a nested table."""
+    header_rows = table.xpath(".//tr[ancestor::thead]")
+    body_rows = table.xpath(".//tr[ancestor::tbody]")
+    footer_rows = table.xpath(".//tr[ancestor::tfoot]")
+    if not header_rows:
+        while body_rows and all(cell.tag == "th" for cell in row_cells(body_rows[0])):
+            header_rows.append(body_rows.pop(0))
+    return ExtractedTable(expand_spans(header_rows, unicode_form), expand_spans(body_rows, unicode_form),
+                          expand_spans(footer_rows, unicode_form))
+
+
+def wrap_bare_rows(table):
+    """Moves <tr> elements that are direct children of a table into a <tbody>, as the html5lib parser of
+    pd.read_html(flavor="bs4") does. The rows of a nested table then count as body rows of the outer one as well."""
+    bare_rows = []
+    for child in list(table) + [None]:
+        if child is not None and child.tag == "tr":
+            bare_rows.append(child)
+            continue
+        if bare_rows:
+            tbody = lxml_html.Element("tbody")
+            bare_rows[0].addprevious(tbody)
+            tbody.extend(bare_rows)
+            bare_rows = []
+
+
+def extract_table_text_list(resolution_html: str, unicode_form=None):
+    """Parses the HTML once with lxml and returns the text of all displayed tables"""
+    document = lxml_html.document_fromstring(resolution_html)
+    for table in list(document.iter("table")):
+        wrap_bare_rows(table)
+    tables = []
+    for table in list(document.iter("table")):
+        if is_hidden(table):
+            continue
+        for hidden_element in table.xpath(".//*[@style]"):
+            if is_hidden(hidden_element):
+                hidden_element.drop_tree()
+        # pd.read_html turns every <br> into a line break, which becomes a space like all whitespace
+        for line_break in table.iter("br"):
+            line_break.tail = "\n" + (line_break.tail or "")
+        if not any(RE_ANY_TEXT.search(text) for text in table.itertext()):
+            continue
+        tables.append(extract_table_text(table, unicode_form))
+    if not tables:
+        raise ValueError("No tables found")
+    return tables
+
+
+def table_to_frame(table: ExtractedTable):
+    """Converts the extracted text of a table into a dataframe, with the same type inference as pd.read_html"""
+    header = None
+    body = table.header + table.body + table.footer
+    if table.header:
+        if len(table.header) == 1:
+            header = 0
+        else:
+            # Ignore all-empty header rows
+            header = [row_id for row_id, row in enumerate(table.header) if any(text for text in row)]
+    # Ragged rows are padded with empty cells
+    max_length = max((len(row) for row in body), default=0)
+    body = [row + [""] * (max_length - len(row)) for row in body]
+    with TextParser(body, header=header, thousands=",", decimal=".") as text_parser:
+        return text_parser.read()
+
+
+def extract_tables(resolution_html: str, unicode_form=None):
+    """Drop-in replacement for pd.read_html(resolution_html, flavor="bs4"), returning a list of dataframes"""
+    return [table_to_frame(table) for table in extract_table_text_list(resolution_html, unicode_form)]
+
+
+def promote_header_rows(dataframe, header_rows: int = 1):
+    """Uses the first rows of a header-less table as column names and returns the remaining rows.
+    With more than one header row, sub-headers are appended to their parent, e.g. "External vCSA - Min".
+    The row positions of the HTML table are kept as index."""
+    header = dataframe[:header_rows].values.tolist()
+    column_names = header[0]
+    for sub_header in header[1:]:
+        column_names = [
+            name if pd.isna(sub_name) or sub_name == name else f"{name} - {sub_name}"
+            for name, sub_name in zip(column_names, sub_header)
+        ]
+    current_df = dataframe[header_rows:]
+    current_df.columns = column_names
+    return current_df
@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+""" version_index.py: Provides resolution table from VMware KBs as machine-readable json files.
+VMware KBs provide release information only as a human-readable HTML table.
+However, for automation it would be nice to have it in a machine-readable format.
+This script takes the tables from a VMware KB page and provides a json-file as an output.
+
+This program is free software: you can redistribute it and/or modify it under
+the terms of the GNU General Public License as published by the Free Software
+Foundation, either version 3 of the License, or (at your option) any later
+version.
+This program is distributed in the hope that it will be useful, but WITHOUT
+ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+You should have received a copy of the GNU General Public License along with
+this program. If not, see <http://www.gnu.org/licenses/>.
+"""
+
+__author__ = "Dominik Zorgnotti"
+__contact__ = "dominik@why-did-it.fail"
+__created__ = "2026-10-17"
+__deprecated__ = False
+__contact__ = "dominik@why-did-it.fail"
+__license__ = "GPLv3"
+__status__ = "beta"
+__version__ = "0.1.0"
+
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+from bisect import bisect_left, bisect_right
+from heapq import merge
+
+import pandas as pd
+
+from build_index import BUILD_INDEX_FILENAME, COLUMNS, read_index_rows
+from date_parsing import parse_dates
+from versions import version_bounds
+
+
+class ReleaseLine:
+    """The releases of one product and build type, sorted by version key for range queries and by release date,
+    with the highest version released up to each date, for "latest before" queries"""
+
+    def __init__(self, entries):
+        self.entries = sorted(entries, key=lambda entry: (entry["version_key"], entry["build"]))
+        self.keys = [entry["version_key"] for entry in self.entries]
+        release_dates, _, _ = parse_dates(pd.Series([entry["release_date"] for entry in self.entries], dtype=object))
+        dated_entries = sorted(((release_date.date().isoformat(), entry)
+                                for release_date, entry in zip(release_dates, self.entries)
+                                if not pd.isna(release_date)), key=lambda dated_entry: dated_entry[0])
+        self.dates = [release_date for release_date, _ in dated_entries]
+        self.latest_entries = []
+        for release_date, entry in dated_entries:
+            if not self.latest_entries or entry["version_key"] >= self.latest_entries[-1]["version_key"]:
+                self.latest_entries.append(entry)
+            else:
+                self.latest_entries.append(self.latest_entries[-1])
+
+    def range(self, low_key=None, high_key=None):
+        """Returns the releases with a version key between the bounds (both inclusive), in version order"""
+        start = bisect_left(self.keys, low_key) if low_key is not None else 0
+        end = bisect_right(self.keys, high_key) if high_key is not None else len(self.keys)
+        return self.entries[start:end]
+
+    def latest_before(self, release_date: str):
+        """Returns the highest version released on or before an ISO date, None if there is none"""
+        position = bisect_right(self.dates, release_date)
+        return self.latest_entries[position - 1] if position else None
+
+
+class VersionIndex:
+    """Version-ordered release lines of all products in the build index.
+    Products are matched like the --product filter of main.py: by name, ignoring case, or by a part of it."""
+
+    def __init__(self, entries):
+        lines = {}
+        for entry in entries:
+            if entry["version_key"] is not None:
+                lines.setdefault((entry["product"], entry["build_type"]), []).append(entry)
+        self.lines = {line_id: ReleaseLine(line_entries) for line_id, line_entries in lines.items()}
+
+    @classmethod
+    def from_index_file(cls, index_file: str):
+        """Loads the release lines from a build index file"""
+        return cls(dict(zip(COLUMNS, row)) for row in read_index_rows(index_file))
+
+    def products(self):
+        """Returns the product names and build types of all release lines"""
+        return sorted(self.lines, key=lambda line_id: (str(line_id[0]), line_id[1]))
+
+    def matching_lines(self, product: str, build_type=None):
+        """Returns the release lines of a product, the exact name wins over names containing it"""
+        product = product.strip().lower()
+        line_ids = [line_id for line_id in self.lines
+                    if build_type is None or line_id[1] == build_type.lower()]
+        exact_ids = [line_id for line_id in line_ids if (line_id[0] or "").lower() == product]
+        return [self.lines[line_id] for line_id in exact_ids or
+                [line_id for line_id in line_ids if product in (line_id[0] or "").lower()]]
+
+    def range(self, product: str, from_version=None, to_version=None, build_type=None):
+        """Returns all releases of a product from one version to another, both inclusive and in version order.
+        A bound covers every release it names, e.g. from "7.0 U1" to "7.0 U3" includes 7.0 U3c."""
+        low_key = version_bounds(from_version)[0] if from_version is not None else None
+        high_key = version_bounds(to_version)[1] if to_version is not None else None
+        return list(merge(*(line.range(low_key, high_key) for line in self.matching_lines(product, build_type)),
+                          key=lambda entry: entry["version_key"]))
+
+    def latest_before(self, product: str, release_date: str, build_type=None):
+        """Returns the highest version of a product released on or before an ISO date, None if there is none"""
+        candidates = [line.latest_before(release_date) for line in self.matching_lines(product, build_type)]
+        candidates = [entry for entry in candidates if entry is not None]
+        return max(candidates, key=lambda entry: entry["version_key"]) if candidates else None
+
+
+def parse_arguments():
+    """Returns the parsed command line arguments"""
+    parser = argparse.ArgumentParser(description="Query the releases of a product in version order")
+    parser.add_argument("--index", default=os.path.join("outputs", BUILD_INDEX_FILENAME),
+                        help=f"Path of the build index (default: outputs/{BUILD_INDEX_FILENAME})")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    range_parser = subparsers.add_parser("range", help="All releases of a product between two versions")
+    range_parser.add_argument("product", help="Product name or a part of it, ignoring case (e.g. esxi)")
+    range_parser.add_argument("--from", dest="from_version", help='Lowest version, e.g. "7.0 U1"')
+    range_parser.add_argument("--to", dest="to_version", help='Highest version, e.g. "7.0 U3" (includes 7.0 U3c)')
+    range_parser.add_argument("--build-type", help="Only builds of this type, e.g. esxi for the VxRail KB")
+    latest_parser = subparsers.add_parser("latest", help="The highest version of a product released before a date")
+    latest_parser.add_argument("product", help="Product name or a part of it, ignoring case (e.g. esxi)")
+    latest_parser.add_argument("--before", required=True, help="Release date in ISO format, e.g. 2021-06-30")
+    latest_parser.add_argument("--build-type", help="Only builds of this type, e.g. esxi for the VxRail KB")
+    subparsers.add_parser("products", help="The products and build types in the index")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    try:
+        version_index = VersionIndex.from_index_file(args.index)
+        if args.command == "range":
+            results = version_index.range(args.product, args.from_version, args.to_version, args.build_type)
+        elif args.command == "latest":
+            latest_entry = version_index.latest_before(args.product, args.before, args.build_type)
+            results = [latest_entry] if latest_entry is not None else []
+        else:
+            results = [{"product": product, "build_type": build_type}
+                       for product, build_type in version_index.products()]
+    except (OSError, sqlite3.Error, ValueError) as err:
+        print(f"Cannot query the build index: {err}")
+        sys.exit(2)
+    # One JSON line per release
+    for result in results:
+        print(json.dumps(result))
+    sys.exit(0 if results else 1)
@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+""" versions.py: Provides resolution table from VMware KBs as machine-readable json files.
+VMware KBs provide release information only as a human-readable HTML table.
+However, for automation it would be nice to have it in a machine-readable format.
+This script takes the tables from a VMware KB page and provides a json-file as an output.
+
+This program is free software: you can redistribute it and/or modify it under
+the terms of the GNU General Public License as published by the Free Software
+Foundation, either version 3 of the License, or (at your option) any later
+version.
+This program is distributed in the hope that it will be useful, but WITHOUT
+ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+You should have received a copy of the GNU General Public License along with
+this program. If not, see <http://www.gnu.org/licenses/>.
+"""
+
+__author__ = "Dominik Zorgnotti"
+__contact__ = "dominik@why-did-it.fail"
+__created__ = "2026-10-17"
+__deprecated__ = False
+__contact__ = "dominik@why-did-it.fail"
+__license__ = "GPLv3"
+__status__ = "beta"
+__version__ = "0.1.0"
+
+
+import re
+
+# Parts of a version in sort order, with the number of digits each has in a version key
+VERSION_PARTS = (
+    ("major", 4),
+    ("minor", 4),
+    ("patch", 4),
+    # vCenter Server appliance versions have a fourth part, e.g. 6.7.0.40130
+    ("fix", 8),
+    ("update", 4),
+    # Patch letter of an update, "Update 3c" has the letter c
+    ("letter", 2),
+    # Patch releases after the update: 1 for "P03", 2 for "EP 15" and "Express Patch 15"
+    ("patch_kind", 1),
+    ("patch_number", 4),
+    # Letter of a patch release, "EP 1a" has the letter a
+    ("patch_letter", 2),
+)
+PATCH_KINDS = {"p": 1, "patch": 1, "ep": 2, "express patch": 2}
+# From version 7 on, the third part of a version is its Update level: ESXi 7.0.3 is ESXi 7.0 Update 3
+UPDATE_AS_PATCH_MAJOR = 7
+
+RE_NUMERIC_VERSION = re.compile(r"(?<![\d.])(\d+)\.(\d+)(?:\.(\d+))?(?:\.(\d+))?([a-z])?(?![\d.])", re.IGNORECASE)
+RE_UPDATE = re.compile(r"\b(?:update|u)\s*(\d+)\s*([a-z])?\b", re.IGNORECASE)
+RE_GA = re.compile(r"\bGA\b", re.IGNORECASE)
+# "Express Patch" before "Patch", so an express patch is not taken for a plain one
+RE_PATCH = re.compile(r"\b(express\s+patch|ep|p|patch)\s*(\d+)([a-z])?\b", re.IGNORECASE)
+
+
+def parse_version(text):
+    """Returns the parts of a version string as dict of part name and int, parts the string does not name are None.
+    Understands major.minor.patch(.fix), "Update 3c"/"U3c", GA, a patch letter and "EP 15"/"Express Patch 15"/"P03"
+    patch releases with an optional letter, e.g. "ESXi 7.0 Update 3c" and "7.0 U3c" both give major 7, minor 0,
+    update 3 and letter 3. From version 7 on the patch part and the Update level are the same number, so "7.0.3" and
+    "7.0 U3" give the same parts; before, an Update without patch part is patch 0 ("6.7 U3" is 6.7.0 Update 3).
+    Returns None for text without a version."""
+    if text is None:
+        return None
+    text = str(text)
+    numeric_version = RE_NUMERIC_VERSION.search(text)
+    if numeric_version is None:
+        return None
+    parts = dict.fromkeys(name for name, _ in VERSION_PARTS)
+    for name, value in zip(("major", "minor", "patch", "fix"), numeric_version.groups()[:4]):
+        if value is not None:
+            parts[name] = int(value)
+    letter = numeric_version.group(5)
+    remainder = text[numeric_version.end():]
+    update = RE_UPDATE.search(remainder)
+    if update is not None:
+        parts["update"] = int(update.group(1))
+        letter = update.group(2) or letter
+    elif RE_GA.search(remainder):
+        parts["update"] = 0
+    if parts["major"] >= UPDATE_AS_PATCH_MAJOR:
+        if parts["patch"] is None:
+            parts["patch"] = parts["update"]
+        elif parts["update"] is None:
+            parts["update"] = parts["patch"]
+    elif parts["update"] is not None and parts["patch"] is None:
+        parts["patch"] = 0
+    if letter is not None:
+        parts["letter"] = ord(letter.lower()) - ord("a") + 1
+    patch_release = RE_PATCH.search(remainder)
+    if patch_release is not None:
+        parts["patch_kind"] = PATCH_KINDS[" ".join(patch_release.group(1).lower().split())]
+        parts["patch_number"] = int(patch_release.group(2))
+        if patch_release.group(3) is not None:
+            parts["patch_letter"] = ord(patch_release.group(3).lower()) - ord("a") + 1
+    return parts
+
+
+def format_version_key(parts, fill: int = 0):
+    """Returns the sortable key of version parts: fixed-width numbers, so keys compare like the versions.
+    Parts before the last given one count as 0, parts after it are filled with 0 or, for fill=-1, their maximum.
+    The fourth part of appliance versions is a build of the patch version, with fill=-1 it is filled with its maximum
+    wherever it is missing, so "7.0 U3" covers 7.0.3.00100."""
+    last_named = max((index for index, (name, _) in enumerate(VERSION_PARTS) if parts.get(name) is not None),
+                     default=-1)
+    key_parts = []
+    for index, (name, digits) in enumerate(VERSION_PARTS):
+        max_value = 10 ** digits - 1
+        if parts.get(name) is not None:
+            value = min(parts[name], max_value)
+        elif fill == -1 and (index > last_named or name == "fix"):
+            value = max_value
+        else:
+            value = 0
+        key_parts.append(f"{value:0{digits}d}")
+    return ".".join(key_parts)
+
+
+def version_key(text):
+    """Returns the sortable key of a version string, None if it has no version"""
+    parts = parse_version(text)
+    return format_version_key(parts) if parts is not None else None
+
+
+def version_bounds(text):
+    """Returns the lowest and highest key of all versions a version string covers, as bounds of a range query.
+    "7.0 U3" covers 7.0 Update 3, 3a, 3b ... and its patch releases, "7" everything of major version 7.
+    Raises ValueError for text without a version."""
+    text = str(text).strip()
+    if text.isdigit():
+        parts = {"major": int(text)}
+    else:
+        parts = parse_version(text)
+    if parts is None:
+        raise ValueError(f"No version in {text!r}")
+    return format_version_key(parts), format_version_key(parts, fill=-1)
@@ -24,23 +24,255 @@ __license__ = "GPLv3"
 __status__ = "beta"
 __version__ = "0.2.0"
 
-import requests, re
+import requests, re, time
+import logging
+import random
+import threading
 from bs4 import BeautifulSoup
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from requests.adapters import HTTPAdapter
+
+import instrumentation
 
 BASEURL_VMWARE_KB = "https://kb.vmware.com/services/apexrest/v1/article?docid="
+# Number of KB articles fetched in parallel, kept low to be nice to the KB API
+DEFAULT_FETCH_WORKERS = 8
+# Seconds to wait for the connection and for every read, a hung connection must not stall the run
+DEFAULT_TIMEOUT = 30.0
+# Retries of a request that timed out, failed to connect or got one of these status codes
+DEFAULT_RETRIES = 5
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+# Exponential backoff between retries: a random wait up to base * 2^retry seconds, but never more than the maximum
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30.0
+# Requests per second to the KB API, the rate is halved on every HTTP 429 and recovers with successful requests
+DEFAULT_RATE_LIMIT = 10.0
+MIN_RATE_LIMIT = 0.5
+RATE_RECOVERY_STEP = 0.1
+
+
+class AdaptiveRateLimiter:
+    """Token bucket shared by all fetch threads. Every throttled response (HTTP 429) halves the rate and pauses all
+    requests for its Retry-After time, every successful request raises the rate again by a step up to the limit."""
+
+    def __init__(self, rate: float = DEFAULT_RATE_LIMIT, min_rate: float = MIN_RATE_LIMIT):
+        self.max_rate = rate
+        self.min_rate = min(min_rate, rate)
+        self.rate = rate
+        self.tokens = max(1.0, rate)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Blocks until a request may be sent"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                # At most one second worth of requests can be sent at once
+                self.tokens = min(max(1.0, self.rate), self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if now >= self.paused_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait_seconds = max(self.paused_until - now, (1 - self.tokens) / self.rate)
+            time.sleep(wait_seconds)
+
+    def throttled(self, retry_after=None):
+        """Backs off after an HTTP 429, optionally pausing all requests for retry_after seconds"""
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = 0.0
+            if retry_after is not None:
+                self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+        logging.warning(f"KB API is throttling, slowing down to {self.rate:.1f} requests per second")
+
+    def succeeded(self):
+        """Recovers the rate after a successful request"""
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate * RATE_RECOVERY_STEP)
+
+
+class RetryPolicy:
+    """Timeout, retries with exponential backoff and jitter, and the rate limiter for the requests to the KB API"""
+
+    def __init__(self, timeout: float = DEFAULT_TIMEOUT, retries: int = DEFAULT_RETRIES,
+                 backoff_base: float = BACKOFF_BASE, backoff_max: float = BACKOFF_MAX,
+                 rate_limit=DEFAULT_RATE_LIMIT):
+        self.timeout = timeout
+        self.retries = max(0, retries)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        # No rate limiter without a rate limit, throttled requests are still retried after their Retry-After time
+        self.rate_limiter = AdaptiveRateLimiter(rate_limit) if rate_limit else None
+
+    def backoff_seconds(self, retry: int, retry_after=None):
+        """Returns the wait before a retry, the Retry-After time of the response if it has one"""
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** retry))
+
+    def get(self, http_client, url: str, headers=None):
+        """Sends a GET request with retries. Returns the response and the number of retries it took.
+        The response of the last attempt is returned as is, the error of the last attempt is raised."""
+        retry = 0
+        while True:
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            try:
+                response = http_client.get(url, headers=headers, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as err:
+                if retry >= self.retries:
+                    raise
+                wait_seconds = self.backoff_seconds(retry)
+                logging.info(f"Retrying {url} in {wait_seconds:.1f}s: {err}")
+            else:
+                if response.status_code not in RETRY_STATUS_CODES or retry >= self.retries:
+                    if self.rate_limiter is not None and response.ok:
+                        self.rate_limiter.succeeded()
+                    return response, retry
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                if response.status_code == 429 and self.rate_limiter is not None:
+                    self.rate_limiter.throttled(retry_after)
+                wait_seconds = self.backoff_seconds(retry, retry_after)
+                logging.info(f"Retrying {url} in {wait_seconds:.1f}s: HTTP {response.status_code}")
+                response.close()
+            time.sleep(wait_seconds)
+            retry += 1
 
 
-def get_kb_webdata(kb_article_id: int):
-    """Accepts an int with the KB article id and will return the wbe response as JSON output"""
+def parse_retry_after(value):
+    """Returns the seconds of a Retry-After header, given as seconds or as HTTP date, None if missing or invalid"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+def create_kb_session(max_workers: int = DEFAULT_FETCH_WORKERS, retry_policy=None):
+    """Returns a requests session with a keep-alive connection pool large enough for all fetch workers.
+    The retry policy (and its rate limiter) is shared by all requests of the session."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, max_workers))
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.retry_policy = retry_policy if retry_policy is not None else RetryPolicy()
+    return session
+
+
+def get_kb_webdata(kb_article_id: int, session=None, cache=None):
+    """Accepts an int with the KB article id and will return the wbe response as JSON output.
+    An optional requests session can be passed on to re-use its connections.
+    With a KbCache, fresh articles are served from disk and stale ones are revalidated with ETag/Last-Modified."""
+    start = time.perf_counter()
+    entry = None
+    if cache is not None:
+        entry = cache.lookup(kb_article_id)
+        if entry is not None and (cache.offline or cache.is_fresh(entry)):
+            article = cache.load(kb_article_id)
+            instrumentation.record_fetch(kb_article_id, time.perf_counter() - start, entry["size"], "cache")
+            return article
+        if cache.offline:
+            raise LookupError(f"KB {kb_article_id} is not cached, cannot fetch it in offline mode")
     vmware_kb_url = f"{BASEURL_VMWARE_KB}{str(kb_article_id)}"
-    response = requests.get(vmware_kb_url)
+    http_client = session if session is not None else requests
+    retry_policy = getattr(session, "retry_policy", None) or RetryPolicy(rate_limit=None)
+    headers = cache.revalidation_headers(entry) if cache is not None else None
+    response, retries = retry_policy.get(http_client, vmware_kb_url, headers=headers)
+    if cache is not None and entry is not None and response.status_code == 304:
+        # Not modified since the last fetch, keep using the cached copy
+        cache.mark_validated(kb_article_id)
+        article = cache.load(kb_article_id)
+        instrumentation.record_fetch(kb_article_id, time.perf_counter() - start, entry["size"], "revalidated",
+                                     retries)
+        return article
     response.raise_for_status()
-    return response.json()
+    if cache is not None:
+        cache.store(kb_article_id, response.content,
+                    etag=response.headers.get("ETag"), last_modified=response.headers.get("Last-Modified"))
+    article = response.json()
+    instrumentation.record_fetch(kb_article_id, time.perf_counter() - start, len(response.content), "network",
+                                 retries)
+    return article
+
+
+def get_kb_webdata_or_none(kb_article_id: int, session=None, cache=None):
+    """Like get_kb_webdata, but a KB that cannot be fetched after all retries is reported and returned as None.
+    This covers request errors, a KB missing from the cache in offline mode (LookupError), a response that is no
+    JSON (ValueError) and an unreadable cache file (OSError, ValueError)."""
+    try:
+        return get_kb_webdata(kb_article_id, session=session, cache=cache)
+    except (requests.RequestException, LookupError, ValueError, OSError) as err:
+        logging.error(f"Cannot fetch KB id {kb_article_id}: {err}")
+        instrumentation.record_status(kb_article_id, "failed", f"fetch failed: {err}")
+        return None
 
 
-def parse_kb_article_ids(summary_kb_article: int):
+def fetch_kb_articles(kb_article_ids, max_workers: int = DEFAULT_FETCH_WORKERS, session=None, cache=None,
+                      retry_policy=None):
+    """Accepts a list of KB article ids and fetches them with a bounded number of threads sharing one session.
+    Returns a list of (kb id, JSON article) tuples in the same order as the input ids, the article is None for KBs
+    that could not be fetched."""
+    kb_article_ids = list(kb_article_ids)
+    max_workers = max(1, max_workers)
+    own_session = session is None
+    if own_session:
+        session = create_kb_session(max_workers, retry_policy)
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            # map() keeps the order of the input, regardless of which request finishes first
+            articles = list(executor.map(lambda kb_id: get_kb_webdata_or_none(kb_id, session=session, cache=cache),
+                                         kb_article_ids))
+    finally:
+        if own_session:
+            session.close()
+    return list(zip(kb_article_ids, articles))
+
+
+def iter_kb_articles(kb_article_ids, max_workers: int = DEFAULT_FETCH_WORKERS, session=None, cache=None,
+                     retry_policy=None):
+    """Like fetch_kb_articles, but yields the (kb id, JSON article) tuples in input order as soon as they arrive.
+    At most max_workers articles are requested ahead, so only a few articles are held in memory at any time."""
+    max_workers = max(1, max_workers)
+    own_session = session is None
+    if own_session:
+        session = create_kb_session(max_workers, retry_policy)
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pending = deque()
+            for kb_id in kb_article_ids:
+                pending.append((kb_id, executor.submit(get_kb_webdata_or_none, kb_id, session=session, cache=cache)))
+                if len(pending) >= max_workers:
+                    kb_id, future = pending.popleft()
+                    yield kb_id, future.result()
+            while pending:
+                kb_id, future = pending.popleft()
+                yield kb_id, future.result()
+    finally:
+        if own_session:
+            session.close()
+
+
+def parse_kb_article_ids(summary_kb_article: int, session=None, cache=None):
     """Accepts an int with the KB article id holding the sub-pages with the release data. Returns these as list of int"""
-    raw_data = get_kb_webdata(summary_kb_article)
+    raw_data = get_kb_webdata(summary_kb_article, session=session, cache=cache)
+    return extract_kb_article_ids(raw_data)
+
+
+def extract_kb_article_ids(raw_data):
+    """Accepts the fetched summary KB article and returns the KB ids linked in its resolution table as list of int"""
     list_of_kb_ids = []
     resolution = raw_data["content"][1]["Resolution"]
     # Parse for anchor tags in the table of the resolution table